@@ -1,5 +1,6 @@
 import granian
 from granian.constants import Interfaces, Loops
+from granian.http import HTTP1Settings, HTTP2Settings
 from granian.log import LogLevels
 
 from app.settings import settings
@@ -12,6 +13,13 @@ if __name__ == "__main__":
         address=settings.app_host,
         port=settings.app_port,
         interface=Interfaces.ASGI,
+        workers=settings.app_workers,
+        runtime_threads=settings.app_runtime_threads,
+        backlog=settings.app_backlog,
+        backpressure=settings.app_backpressure,
+        http=settings.app_http,
+        http1_settings=HTTP1Settings(keep_alive=settings.app_http1_keep_alive),
+        http2_settings=HTTP2Settings(max_concurrent_streams=settings.app_http2_max_concurrent_streams),
         log_level=LogLevels(settings.log_level),
         loop=Loops.uvloop,
     ).serve()
@@ -0,0 +1,105 @@
+import datetime as dt
+import enum
+import os
+import pathlib
+import queue
+import threading
+import time
+import typing
+
+
+class QueueFullPolicy(enum.StrEnum):
+    drop = "drop"
+    block = "block"
+
+
+class BatchingFileSink:
+    """Loguru sink that hands formatted records to a background writer thread.
+
+    The calling thread only enqueues the message; the writer drains the queue in batches,
+    appends them to ``path`` with a single write and rotates the file by size and/or age.
+    With ``per_process`` every process writes to a file of its own, named after its PID, as rotating
+    a file shared by several processes would lose or interleave their batches.
+    """
+
+    block_check_interval: typing.ClassVar[float] = 0.1  # seconds between checks that the writer is still alive
+
+    def __init__(  # noqa: PLR0913
+        self,
+        path: str,
+        *,
+        max_queue_size: int,
+        batch_size: int,
+        policy: QueueFullPolicy,
+        rotation_size: int = 0,
+        rotation_interval: float = 0,
+        per_process: bool = False,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.per_process = per_process
+        self.batch_size = batch_size
+        self.policy = policy
+        self.rotation_size = rotation_size
+        self.rotation_interval = rotation_interval
+        self.dropped = 0
+        self.flushed = 0
+        self._queue: queue.Queue[str | None] = queue.Queue(maxsize=max_queue_size)
+        self._thread = threading.Thread(target=self._run, name="action-log-writer", daemon=True)
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        # resolved only now, in the worker process that is going to write
+        if self.per_process:
+            self.path = self.path.with_name(f"{self.path.stem}.{os.getpid()}{self.path.suffix}")
+        self._thread.start()
+
+    def write(self, message: str) -> None:
+        # waiting for room only makes sense while the writer is there to make it, otherwise the caller would hang
+        while self.policy == QueueFullPolicy.block and self._thread.is_alive():
+            try:
+                self._queue.put(message, timeout=self.block_check_interval)
+            except queue.Full:
+                continue
+            return
+        try:
+            self._queue.put_nowait(message)
+        except queue.Full:
+            self.dropped += 1
+
+    def stop(self) -> None:
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self) -> None:
+        file = self.path.open("a", encoding="utf8")
+        opened_at = time.monotonic()
+        stopping = False
+        try:
+            while not stopping:
+                batch = [self._queue.get()]
+                while len(batch) < self.batch_size and not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                messages = [message for message in batch if message is not None]
+                stopping = len(messages) < len(batch)
+                if not messages:
+                    continue
+                if self._should_rotate(file, opened_at):
+                    file.close()
+                    self.path.replace(f"{self.path}.{dt.datetime.now(dt.UTC):%Y-%m-%d_%H-%M-%S_%f}")
+                    file = self.path.open("a", encoding="utf8")
+                    opened_at = time.monotonic()
+                file.write("".join(messages))
+                file.flush()
+                self.flushed += len(messages)
+        finally:
+            file.close()
+
+    def _should_rotate(self, file: typing.TextIO, opened_at: float) -> bool:
+        if not file.tell():
+            return False
+        if self.rotation_size and file.tell() >= self.rotation_size:
+            return True
+        return bool(self.rotation_interval) and time.monotonic() - opened_at >= self.rotation_interval
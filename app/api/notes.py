@@ -1,29 +1,51 @@
 import sys
 import typing
+from collections.abc import AsyncIterator
 
 import fastapi
+import pydantic
+import sqlalchemy as sa
 from advanced_alchemy.exceptions import NotFoundError
 from advanced_alchemy.extensions.fastapi import filters as aa_filters
-from advanced_alchemy.extensions.fastapi.providers import provide_filters
-from advanced_alchemy.service import OffsetPagination
 from fastapi import Depends, status
 from loguru import logger
 from modern_di_fastapi import FromDI
+from sqlalchemy.ext.asyncio import AsyncEngine
 
 from app import ioc, models, schemas
+from app.action_log import BatchingFileSink
 from app.auth import get_current_user
+from app.compression import DecompressingRoute
 from app.error_messages import NotesErrorMessages as Errors
-from app.exceptions import AccessDeniedError
-from app.repositories import NotesService
+from app.error_messages import RequestErrorMessages
+from app.etags import if_match_versions, list_etag, none_match, note_etag
+from app.exceptions import AccessDeniedError, InvalidCursorError, InvalidImportHeaderError, PreconditionFailedError
+from app.imports import ImportedLine, ImportFormat, parse_notes
+from app.pagination import CountMode, PaginationParams, PaginationType, SearchParams, provide_limit_offset
+from app.projections import NoteFields, ProjectionParams
+from app.repositories import NotesRepository, NotesService
+from app.resources.db import open_session
+from app.responses import NDJSONStreamingResponse, ORJSONResponse, ndjson_lines
 from app.settings import settings
 
 
-ROUTER: typing.Final = fastapi.APIRouter(prefix="/notes")
+ROUTER: typing.Final = fastapi.APIRouter(prefix="/notes", route_class=DecompressingRoute)
 
 logger.remove()
 logger.add(sys.stderr, level=settings.log_level.upper(), filter=lambda record: record["name"] != "app.api.notes")
-logger.add(
+ACTIONS_LOG_SINK: typing.Final = BatchingFileSink(
     settings.actions_log_file,
+    max_queue_size=settings.actions_log_queue_size,
+    batch_size=settings.actions_log_batch_size,
+    policy=settings.actions_log_queue_full_policy,
+    rotation_size=settings.actions_log_rotation_size,
+    rotation_interval=settings.actions_log_rotation_interval,
+    per_process=settings.app_workers > 1,
+)
+ACTIONS_LOG_SINK.start()
+logger.add(
+    ACTIONS_LOG_SINK,
+    colorize=False,
     level=settings.log_level.upper(),
     filter="app.api.notes",
     format="{time} | {level: <8} | {name}:{function}:{line} - User #{extra[user_id]} "
@@ -31,71 +53,363 @@ logger.add(
 )
 
 
-@ROUTER.get("/my/", response_model=OffsetPagination[schemas.Note])
-async def list_my_notes(
-    filters: typing.Annotated[
-        list[aa_filters.FilterTypes],
-        Depends(
-            provide_filters(
-                {
-                    "pagination_type": "limit_offset",
-                }
-            )
-        ),
-    ],
+type NoteSchema = schemas.Note | schemas.NoteSummary
+type NotesPage = schemas.OffsetPagination[NoteSchema] | schemas.CursorPagination[NoteSchema]
+
+
+def projection_statement(
+    notes_service: NotesService, projection: ProjectionParams
+) -> sa.Select[tuple[models.Note]] | None:
+    if projection.fields == NoteFields.summary:
+        return notes_service.repository.summary_statement(projection.preview_length)
+    return None
+
+
+async def list_page(
+    notes_service: NotesService,
+    filters: list[typing.Any],
+    pagination: PaginationParams,
+    schema_type: type[NoteSchema],
+    statement: sa.Select[tuple[models.Note]] | None = None,
+) -> NotesPage:
+    limit_offset = next(item for item in filters if isinstance(item, aa_filters.LimitOffset))
+    if pagination.pagination_type == PaginationType.limit_offset:
+        total: int | None = None
+        match pagination.count:
+            case CountMode.exact:
+                results, total = await notes_service.list_and_count(*filters, statement=statement)
+            case CountMode.estimate:
+                # planner statistics spare the scan an exact count makes of every matching note
+                results = await notes_service.list(*filters, statement=statement)
+                total = await notes_service.estimate_count(*filters)
+            case CountMode.none:
+                results = await notes_service.list(*filters, statement=statement)
+        return schemas.OffsetPagination[schema_type](
+            items=[schema_type.model_validate(item) for item in results],
+            limit=limit_offset.limit,
+            offset=limit_offset.offset,
+            total=total,
+        )
+
+    filters = [item for item in filters if item is not limit_offset]
+    try:
+        results, next_cursor = await notes_service.list_after_cursor(
+            *filters, cursor=pagination.cursor, limit=limit_offset.limit, statement=statement
+        )
+    except InvalidCursorError:
+        logger.warning("tried to list notes with an invalid cursor")
+        raise fastapi.HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=Errors.invalid_cursor) from None
+    return schemas.CursorPagination[schema_type](
+        items=[schema_type.model_validate(item) for item in results],
+        limit=limit_offset.limit,
+        next_cursor=next_cursor,
+    )
+
+
+async def search_page(
+    notes_service: NotesService,
+    filters: list[typing.Any],
+    params: SearchParams,
+    schema_type: type[schemas.Note],
+) -> schemas.CursorPagination[schemas.Note]:
+    try:
+        results, next_cursor = await notes_service.search(
+            *filters, query=params.q, cursor=params.cursor, limit=params.page_size
+        )
+    except InvalidCursorError:
+        logger.warning("tried to search notes with an invalid cursor")
+        raise fastapi.HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=Errors.invalid_cursor) from None
+    return schemas.CursorPagination[schema_type](
+        items=[schema_type.model_validate(item) for item in results],
+        limit=params.page_size,
+        next_cursor=next_cursor,
+    )
+
+
+async def export_lines(engine: AsyncEngine, filters: list[typing.Any]) -> AsyncIterator[bytes]:
+    # the request-scoped session is closed before the response body is sent, so the export opens its own
+    async with open_session(engine) as session:
+        repository = NotesRepository(session=session)
+        async for rows in repository.stream_rows(*filters, chunk_size=settings.notes_export_chunk_size):
+            yield ndjson_lines(dict(row) for row in rows)
+
+
+async def import_lines(
+    lines: AsyncIterator[ImportedLine], notes_service: NotesService, user: schemas.Principal
+) -> schemas.NoteImportResult:
+    result = schemas.NoteImportResult(created=0, failed=0, errors=[])
+    batch: list[dict[str, typing.Any]] = []
+    async for item in lines:
+        if item.note is None:
+            result.failed += 1
+            if len(result.errors) < settings.notes_import_max_reported_errors:
+                result.errors.append(schemas.NoteImportError(line=item.line, detail=typing.cast("str", item.error)))
+            continue
+        batch.append(item.note.model_dump())
+        if len(batch) >= settings.notes_import_batch_size:
+            result.created += len(await notes_service.bulk_create_with_author(batch, author=user))
+            batch = []
+    if batch:
+        result.created += len(await notes_service.bulk_create_with_author(batch, author=user))
+    return result
+
+
+def bulk_results(outcomes: dict[int, models.Note | Exception], success_status: int) -> schemas.NoteBulkResults:
+    items = []
+    for item_id, outcome in outcomes.items():
+        match outcome:
+            case AccessDeniedError():
+                result = schemas.NoteBulkResult(
+                    id=item_id, status=status.HTTP_403_FORBIDDEN, detail=Errors.access_denied_only_owner
+                )
+            case NotFoundError():
+                result = schemas.NoteBulkResult(
+                    id=item_id, status=status.HTTP_404_NOT_FOUND, detail=Errors.note_not_found
+                )
+            case _:
+                note = outcome if success_status != status.HTTP_204_NO_CONTENT else None
+                result = schemas.NoteBulkResult(id=item_id, status=success_status, note=note)
+        items.append(result)
+    return schemas.NoteBulkResults(items=items)
+
+
+def log_bulk_results(results: schemas.NoteBulkResults, action: str) -> None:
+    failed = [item for item in results.items if item.detail is not None]
+    succeeded = [f"#{item.id}" for item in results.items if item.detail is None]
+    if succeeded:
+        logger.info(f"successfully {action} notes {', '.join(succeeded)}")
+    for item in failed:
+        logger.warning(f"failed to bulk {action.removesuffix('d')} note #{item.id}: {item.detail}")
+
+
+@ROUTER.get(
+    "/my/",
+    response_model=schemas.OffsetPagination[schemas.Note | schemas.NoteSummary]
+    | schemas.CursorPagination[schemas.Note | schemas.NoteSummary],
+)
+async def list_my_notes(  # noqa: PLR0913
+    limit_offset: typing.Annotated[aa_filters.LimitOffset, Depends(provide_limit_offset)],
+    pagination: typing.Annotated[PaginationParams, Depends()],
+    projection: typing.Annotated[ProjectionParams, Depends()],
+    if_none_match: typing.Annotated[str | None, fastapi.Header()] = None,
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
-) -> OffsetPagination[schemas.Note]:
+    user: schemas.Principal = Depends(get_current_user),
+) -> ORJSONResponse:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
-        results, total = await notes_service.list_and_count(
-            models.Note.author_id == user.id,
-            notes_service.not_deleted_filter,
-            *filters,
-        )
+        # every change to a note of the user, deletion and restoration included, moves its latest updated_at;
+        # it is read before the page, so a write in between makes the ETag older than the page, never newer
+        last_modified = await notes_service.get_last_modified(user.id)
+        etag = list_etag(user.id, last_modified, limit_offset.limit, limit_offset.offset, pagination, projection)
+        if not none_match(if_none_match, etag):
+            logger.info("listed their notes, which have not been modified")
+            raise fastapi.HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+        filters = [models.Note.author_id == user.id, notes_service.not_deleted_filter, limit_offset]
+        schema_type = schemas.NoteSummary if projection.fields == NoteFields.summary else schemas.Note
+        statement = projection_statement(notes_service, projection)
+        page = await list_page(notes_service, filters, pagination, schema_type=schema_type, statement=statement)
         logger.info("successfully listed their notes")
-        return notes_service.to_schema(results, total, filters=filters, schema_type=schemas.Note)
-
-
-@ROUTER.get("/", response_model=OffsetPagination[schemas.NoteAdmin])
-async def list_notes(
-    filters: typing.Annotated[
-        list[aa_filters.FilterTypes],
-        Depends(
-            provide_filters(
-                {
-                    "pagination_type": "limit_offset",
-                }
-            )
-        ),
-    ],
+        return ORJSONResponse(page, headers={"ETag": etag})
+
+
+@ROUTER.get(
+    "/",
+    response_model=schemas.OffsetPagination[schemas.NoteAdmin | schemas.NoteAdminSummary]
+    | schemas.CursorPagination[schemas.NoteAdmin | schemas.NoteAdminSummary],
+)
+async def list_notes(  # noqa: PLR0913
+    limit_offset: typing.Annotated[aa_filters.LimitOffset, Depends(provide_limit_offset)],
+    pagination: typing.Annotated[PaginationParams, Depends()],
+    projection: typing.Annotated[ProjectionParams, Depends()],
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
+    user: schemas.Principal = Depends(get_current_user),
     author_id: int | None = None,
-) -> OffsetPagination[schemas.Note]:
+) -> ORJSONResponse:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
         if not user.is_admin:
             logger.warning("tried to access admin-only list of notes")
             raise fastapi.HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, detail=Errors.access_denied_only_admin
             ) from None
+        filters: list[typing.Any] = [limit_offset]
         extra_info = ""
         if author_id is not None:
             filters.append(models.Note.author_id == author_id)
             extra_info = f" for author with ID: {author_id}"
-        results, total = await notes_service.list_and_count(*filters)
+        schema_type = schemas.NoteAdminSummary if projection.fields == NoteFields.summary else schemas.NoteAdmin
+        statement = projection_statement(notes_service, projection)
+        page = await list_page(notes_service, filters, pagination, schema_type=schema_type, statement=statement)
         logger.info("successfully listed notes" + extra_info)
-        return notes_service.to_schema(results, total, filters=filters, schema_type=schemas.NoteAdmin)
+        return ORJSONResponse(page)
+
+
+@ROUTER.get("/my/search/", response_model=schemas.CursorPagination[schemas.Note])
+async def search_my_notes(
+    params: typing.Annotated[SearchParams, Depends()],
+    notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
+    user: schemas.Principal = Depends(get_current_user),
+) -> ORJSONResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        filters = [models.Note.author_id == user.id, notes_service.not_deleted_filter]
+        page = await search_page(notes_service, filters, params, schema_type=schemas.Note)
+        logger.info("successfully searched their notes")
+        return ORJSONResponse(page)
+
+
+@ROUTER.get("/search/", response_model=schemas.CursorPagination[schemas.NoteAdmin])
+async def search_notes(
+    params: typing.Annotated[SearchParams, Depends()],
+    notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
+    user: schemas.Principal = Depends(get_current_user),
+    author_id: int | None = None,
+) -> ORJSONResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        if not user.is_admin:
+            logger.warning("tried to search admin-only list of notes")
+            raise fastapi.HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=Errors.access_denied_only_admin)
+        filters = []
+        extra_info = ""
+        if author_id is not None:
+            filters.append(models.Note.author_id == author_id)
+            extra_info = f" for author with ID: {author_id}"
+        page = await search_page(notes_service, filters, params, schema_type=schemas.NoteAdmin)
+        logger.info("successfully searched notes" + extra_info)
+        return ORJSONResponse(page)
+
+
+@ROUTER.get(
+    "/export/",
+    response_class=NDJSONStreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {NDJSONStreamingResponse.media_type: {}}}},
+)
+async def export_notes(
+    engine: AsyncEngine = FromDI(ioc.Dependencies.database_engine),
+    user: schemas.Principal = Depends(get_current_user),
+    author_id: int | None = None,
+    include_deleted: bool = False,
+    updated_since: pydantic.AwareDatetime | None = None,
+) -> NDJSONStreamingResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        if not user.is_admin:
+            logger.warning("tried to export notes")
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN, detail=Errors.access_denied_only_admin
+            ) from None
+        filters: list[typing.Any] = []
+        extra_info = ""
+        if author_id is not None:
+            filters.append(models.Note.author_id == author_id)
+            extra_info = f" of author with ID: {author_id}"
+        if not include_deleted:
+            filters.append(NotesService.not_deleted_filter)
+        if updated_since is not None:
+            filters.append(models.Note.updated_at >= updated_since)
+        logger.info("started export of notes" + extra_info)
+        return NDJSONStreamingResponse(
+            export_lines(engine, filters), headers={"Content-Disposition": 'attachment; filename="notes.ndjson"'}
+        )
+
+
+@ROUTER.post(
+    "/import/",
+    status_code=status.HTTP_201_CREATED,
+    response_model=schemas.NoteImportResult,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {import_format.value: {"schema": {"type": "string"}} for import_format in ImportFormat},
+        }
+    },
+)
+async def import_notes(
+    request: fastapi.Request,
+    content_type: typing.Annotated[str, fastapi.Header()] = "",
+    content_encoding: typing.Annotated[str, fastapi.Header()] = "",
+    notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
+    user: schemas.Principal = Depends(get_current_user),
+) -> ORJSONResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        import_format = ImportFormat.from_content_type(content_type)
+        if import_format is None:
+            logger.warning(f"tried to import notes from '{content_type}'")
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=Errors.unsupported_import_type
+            )
+        if content_encoding.strip().lower() not in {"", "identity"}:
+            logger.warning(f"tried to import notes with '{content_encoding}' encoding")
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, detail=RequestErrorMessages.unsupported_encoding
+            )
+        lines = parse_notes(request.stream(), import_format, settings.notes_import_max_line_size)
+        try:
+            result = await import_lines(lines, notes_service, user)
+        except InvalidImportHeaderError:
+            logger.warning("tried to import notes from CSV without title and body columns")
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail=Errors.invalid_import_header
+            ) from None
+        logger.info(f"successfully imported {result.created} notes, {result.failed} lines failed")
+        return ORJSONResponse(result, status_code=status.HTTP_201_CREATED)
+
+
+@ROUTER.post("/bulk/", status_code=status.HTTP_201_CREATED, response_model=schemas.NoteBulkResults)
+async def bulk_create_notes(
+    data: schemas.NoteBulkCreate,
+    notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
+    user: schemas.Principal = Depends(get_current_user),
+) -> ORJSONResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        instances = await notes_service.bulk_create_with_author([item.model_dump() for item in data.items], author=user)
+        results = bulk_results({instance.id: instance for instance in instances}, status.HTTP_201_CREATED)
+        log_bulk_results(results, "created")
+        return ORJSONResponse(results, status_code=status.HTTP_201_CREATED)
+
+
+@ROUTER.patch("/bulk/", response_model=schemas.NoteBulkResults)
+async def bulk_update_notes(
+    data: schemas.NoteBulkUpdate,
+    notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
+    user: schemas.Principal = Depends(get_current_user),
+) -> ORJSONResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        outcomes = await notes_service.bulk_update_with_access_check(
+            [item.model_dump() for item in data.items], user=user
+        )
+        results = bulk_results(outcomes, status.HTTP_200_OK)
+        log_bulk_results(results, "updated")
+        return ORJSONResponse(results)
+
+
+@ROUTER.delete("/bulk/", response_model=schemas.NoteBulkResults)
+async def bulk_delete_notes(
+    data: schemas.NoteBulkDelete,
+    notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
+    user: schemas.Principal = Depends(get_current_user),
+) -> ORJSONResponse:
+    with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
+        outcomes = await notes_service.bulk_soft_delete(data.ids, user=user)
+        results = bulk_results(outcomes, status.HTTP_204_NO_CONTENT)
+        log_bulk_results(results, "deleted")
+        return ORJSONResponse(results)
 
 
 @ROUTER.get("/{note_id}/")
 async def get_note(
     note_id: int,
+    response: fastapi.Response,
+    if_none_match: typing.Annotated[str | None, fastapi.Header()] = None,
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
+    user: schemas.Principal = Depends(get_current_user),
 ) -> schemas.Note:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
         try:
-            instance = await notes_service.get_one_with_access_check(models.Note.id == note_id, user=user)
+            if if_none_match is not None:
+                # revalidation only needs the version, so the body is not read unless it has changed
+                etag = note_etag(note_id, await notes_service.get_version_with_access_check(note_id, user=user))
+                if not none_match(if_none_match, etag):
+                    logger.info(f"accessed note #{note_id}, which has not been modified")
+                    raise fastapi.HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+            instance = await notes_service.get_one_with_access_check(note_id, user=user)
+            response.headers["ETag"] = note_etag(instance.id, instance.updated_at)
             logger.info(f"successfully accessed note #{note_id}")
         except AccessDeniedError:
             logger.warning(f"tried to access note #{note_id} of another user")
@@ -110,15 +424,23 @@ async def get_note(
 
 
 @ROUTER.put("/{note_id}/")
-async def update_note(
+async def update_note(  # noqa: PLR0913
     note_id: int,
     data: schemas.NoteCreate,
+    response: fastapi.Response,
+    if_match: typing.Annotated[str | None, fastapi.Header()] = None,
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
+    user: schemas.Principal = Depends(get_current_user),
 ) -> schemas.Note:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
         try:
-            instance = await notes_service.update_with_access_check(data=data.model_dump(), item_id=note_id, user=user)
+            instance = await notes_service.update_with_access_check(
+                data=data.model_dump(),
+                item_id=note_id,
+                user=user,
+                expected_versions=if_match_versions(if_match, note_id),
+            )
+            response.headers["ETag"] = note_etag(instance.id, instance.updated_at)
             logger.info(f"successfully updated note #{note_id}")
         except AccessDeniedError:
             logger.warning(f"tried to update note #{note_id} of another user")
@@ -128,6 +450,11 @@ async def update_note(
         except NotFoundError:
             logger.warning(f"tried to update non-existent note #{note_id}")
             raise fastapi.HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=Errors.note_not_found) from None
+        except PreconditionFailedError:
+            logger.warning(f"tried to update note #{note_id} that has been modified since it was fetched")
+            raise fastapi.HTTPException(
+                status_code=status.HTTP_412_PRECONDITION_FAILED, detail=Errors.precondition_failed
+            ) from None
 
     return typing.cast("schemas.Note", instance)
 
@@ -136,7 +463,7 @@ async def update_note(
 async def delete_note(
     note_id: int,
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
+    user: schemas.Principal = Depends(get_current_user),
 ) -> None:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
         try:
@@ -156,7 +483,7 @@ async def delete_note(
 async def create_note(
     data: schemas.NoteCreate,
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
+    user: schemas.Principal = Depends(get_current_user),
 ) -> schemas.Note:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
         instance = await notes_service.create_with_author(data.model_dump(), author=user)
@@ -168,7 +495,7 @@ async def create_note(
 async def restore_note(
     note_id: int,
     notes_service: NotesService = FromDI(ioc.Dependencies.notes_service),
-    user: models.User = Depends(get_current_user),
+    user: schemas.Principal = Depends(get_current_user),
 ) -> schemas.Note:
     with logger.contextualize(user_id=user.id, user_role=user.verbose_role):
         if not user.is_admin:
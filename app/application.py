@@ -1,31 +1,118 @@
+import contextlib
 import dataclasses
+import typing
 
 import fastapi
 import modern_di_fastapi
 from lite_bootstrap import FastAPIBootstrapper
-from opentelemetry.instrumentation.asyncpg import AsyncPGInstrumentor
 from opentelemetry.instrumentation.sqlalchemy import SQLAlchemyInstrumentor
+from prometheus_client import REGISTRY, CollectorRegistry
+from starlette_compress import CompressMiddleware, add_compress_type
 
+from app import ioc
+from app.api.notes import ACTIONS_LOG_SINK
 from app.api.notes import ROUTER as NOTES_ROUTER
 from app.api.users import ROUTER as USERS_ROUTER
+from app.metrics import InFlightMiddleware, RuntimeCollector
+from app.profiling import ProfilingMiddleware
+from app.query_stats import QueryStatsMiddleware
+from app.responses import NDJSON_MEDIA_TYPE, ORJSONResponse
 from app.settings import settings
+from app.tracing import BoundedAsyncPGInstrumentor, TraceSampling
 
 
 def include_routers(app: fastapi.FastAPI) -> None:
-    app.include_router(NOTES_ROUTER, prefix="/api")
-    app.include_router(USERS_ROUTER, prefix="/api")
+    app.include_router(NOTES_ROUTER, prefix="/api", default_response_class=ORJSONResponse)
+    app.include_router(USERS_ROUTER, prefix="/api", default_response_class=ORJSONResponse)
+
+
+def start_background_resources(app: fastapi.FastAPI) -> None:
+    # app-scope resources are created lazily, so the ones that must run from startup are resolved explicitly
+    lifespan_context = app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app_: fastapi.FastAPI) -> typing.AsyncIterator[typing.Any]:
+        async with lifespan_context(app_) as state:
+            await ioc.Dependencies.change_listener.async_resolve(modern_di_fastapi.fetch_di_container(app_))
+            yield state
+
+    app.router.lifespan_context = lifespan
+
+
+def collect_runtime_metrics(app: fastapi.FastAPI, registry: CollectorRegistry) -> None:
+    lifespan_context = app.router.lifespan_context
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app_: fastapi.FastAPI) -> typing.AsyncIterator[typing.Any]:
+        async with lifespan_context(app_) as state:
+            container = modern_di_fastapi.fetch_di_container(app_)
+            collector = RuntimeCollector(
+                engine=await ioc.Dependencies.database_engine.async_resolve(container),
+                password_hasher=await ioc.Dependencies.password_hasher.async_resolve(container),
+                action_log=ACTIONS_LOG_SINK,
+                caches={
+                    "notes": await ioc.Dependencies.notes_cache.async_resolve(container),
+                    "principals": await ioc.Dependencies.principals_cache.async_resolve(container),
+                },
+            )
+            registry.register(collector)
+            try:
+                yield state
+            finally:
+                registry.unregister(collector)
+
+    app.router.lifespan_context = lifespan
 
 
 def build_app() -> fastapi.FastAPI:
+    # instrumentator metrics live in a registry of their own, so that every built application reports its requests;
+    # the global registry still contributes process metrics and the module-level ones from app.metrics
+    metrics_registry = CollectorRegistry()
+    metrics_registry.register(REGISTRY)
     bootstrap_config = dataclasses.replace(
         settings.api_bootstrapper_config,
+        prometheus_instrumentator_params={
+            "excluded_handlers": [settings.api_bootstrapper_config.prometheus_metrics_path],
+            "registry": metrics_registry,
+        },
+        prometheus_instrument_params={"latency_lowr_buckets": settings.metrics_latency_buckets},
         opentelemetry_instrumentors=[
+            TraceSampling(
+                head_ratio=settings.tracing_head_sample_ratio,
+                tail_ratio=settings.tracing_tail_sample_ratio,
+                route_ratios=settings.tracing_route_sample_ratios,
+                tail_latency_threshold=settings.tracing_tail_latency_threshold,
+                tail_max_pending_traces=settings.tracing_tail_max_pending_traces,
+                exporter_endpoint=settings.opentelemetry_endpoint,
+            ),
             SQLAlchemyInstrumentor(),
-            AsyncPGInstrumentor(capture_parameters=True),  # type: ignore[no-untyped-call]
+            BoundedAsyncPGInstrumentor(
+                capture_parameters=settings.tracing_capture_parameters,
+                max_length=settings.tracing_parameter_max_length,
+                max_items=settings.tracing_parameters_max_items,
+                redacted_columns=settings.tracing_redacted_columns,
+            ),
         ],
     )
     bootstrapper = FastAPIBootstrapper(bootstrap_config=bootstrap_config)
     app: fastapi.FastAPI = bootstrapper.bootstrap()
+    if settings.profiling_enabled:
+        app.add_middleware(
+            ProfilingMiddleware, interval=settings.profiling_interval, output_dir=settings.profiling_output_dir
+        )
+    app.add_middleware(
+        CompressMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        zstd_level=settings.compression_level,
+        brotli_quality=settings.compression_level,
+        gzip_level=settings.compression_level,
+    )
+    app.add_middleware(InFlightMiddleware)
+    app.add_middleware(QueryStatsMiddleware, server_timing=settings.service_debug)
+    # streamed types are compressed whatever their size and flushed chunk by chunk
+    add_compress_type(NDJSON_MEDIA_TYPE, streaming=True)
     modern_di_fastapi.setup_di(app)
+    start_background_resources(app)
+    collect_runtime_metrics(app, metrics_registry)
     include_routers(app)
     return app
@@ -2,15 +2,19 @@ from datetime import UTC, datetime, timedelta
 from typing import Annotated
 
 import jwt
+import pydantic
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jwt import InvalidTokenError
 from modern_di_fastapi import FromDI
 
 from app import ioc, models
+from app.cache import TokenRevocations, TTLCache
 from app.error_messages import UserErrorMessages as Errors
+from app.exceptions import PasswordHasherBusyError
+from app.passwords import PasswordHasher
 from app.repositories import UsersService
-from app.schemas.auth import TokenData
+from app.schemas.auth import Principal, TokenData
 from app.settings import settings
 
 
@@ -20,11 +24,18 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/users/token/")
 async def authenticate_user(
     form_data: Annotated[OAuth2PasswordRequestForm, Depends()],
     users_service: UsersService = FromDI(ioc.Dependencies.users_service),
+    password_hasher: PasswordHasher = FromDI(ioc.Dependencies.password_hasher),
 ) -> models.User:
     username = form_data.username
     password = form_data.password
     user = await users_service.get_one_or_none(models.User.login == username)
-    if not user or not user.password.verify(password):
+    try:
+        verified = user is not None and await password_hasher.verify(user.password, password)
+    except PasswordHasherBusyError:
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE, detail=Errors.login_busy, headers={"Retry-After": "1"}
+        ) from None
+    if not user or not verified:
         raise HTTPException(
             status.HTTP_401_UNAUTHORIZED, detail=Errors.wrong_login_pass, headers={"WWW-Authenticate": "Bearer"}
         )
@@ -33,28 +44,69 @@ async def authenticate_user(
 
 def create_access_token(data: dict) -> str:
     to_encode = data.copy()
-    expire = datetime.now(UTC) + timedelta(minutes=settings.jwt_token_expire_minutes)
-    to_encode.update({"exp": expire})
+    expire_minutes = (
+        settings.jwt_trusted_token_expire_minutes if settings.jwt_trust_claims else settings.jwt_token_expire_minutes
+    )
+    issued_at = datetime.now(UTC)
+    to_encode.update({"exp": issued_at + timedelta(minutes=expire_minutes), "iat": issued_at})
     return jwt.encode(to_encode, settings.jwt_secret_key, algorithm=settings.jwt_algorithm)
 
 
-async def get_current_user(
-    token: Annotated[str, Depends(oauth2_scheme)], users_service: UsersService = FromDI(ioc.Dependencies.users_service)
-) -> models.User:
-    credentials_exception = HTTPException(
-        status_code=status.HTTP_401_UNAUTHORIZED,
-        detail=Errors.invalid_token,
-        headers={"WWW-Authenticate": "Bearer"},
-    )
+def get_principal_from_claims(token_data: TokenData, token_revocations: TokenRevocations) -> Principal | None:
+    if token_data.username is None or token_data.user_id is None or token_data.role is None:
+        return None
+    if token_revocations.is_revoked(token_data.user_id, token_data.issued_at):
+        return None
+    return Principal(id=token_data.user_id, login=token_data.username, is_admin=token_data.role == "admin")
+
+
+def decode_token(token: str) -> TokenData | None:
     try:
         payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
         username = payload.get("sub")
         if username is None:
-            raise credentials_exception from None
-        token_data = TokenData(username=username)
-    except InvalidTokenError:
-        raise credentials_exception from None
+            return None
+        return TokenData(
+            username=username, user_id=payload.get("uid"), role=payload.get("role"), issued_at=payload.get("iat")
+        )
+    except (InvalidTokenError, pydantic.ValidationError):
+        return None
+
+
+async def find_principal(
+    token_data: TokenData,
+    users_service: UsersService,
+    principals_cache: TTLCache[str, Principal],
+    token_revocations: TokenRevocations,
+) -> Principal | None:
+    if settings.jwt_trust_claims and (principal := get_principal_from_claims(token_data, token_revocations)):
+        return principal
+    principal = principals_cache.get(token_data.username)
+    if principal is not None:
+        return principal
     user = await users_service.get_one_or_none(models.User.login == token_data.username)
     if user is None:
+        return None
+    principal = Principal.model_validate(user)
+    principals_cache.set(token_data.username, principal)
+    return principal
+
+
+async def get_current_user(
+    token: Annotated[str, Depends(oauth2_scheme)],
+    users_service: UsersService = FromDI(ioc.Dependencies.users_service),
+    principals_cache: TTLCache[str, Principal] = FromDI(ioc.Dependencies.principals_cache),
+    token_revocations: TokenRevocations = FromDI(ioc.Dependencies.token_revocations),
+) -> Principal:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail=Errors.invalid_token,
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    token_data = decode_token(token)
+    if token_data is None:
         raise credentials_exception
-    return user
+    principal = await find_principal(token_data, users_service, principals_cache, token_revocations)
+    if principal is None:
+        raise credentials_exception
+    return principal
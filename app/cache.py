@@ -0,0 +1,156 @@
+import time
+import typing
+from collections import OrderedDict
+
+
+class Cache[K, V](typing.Protocol):
+    """Interface the services rely on, so the in-process ``TTLCache`` can be swapped for another backend."""
+
+    def get(self, key: K) -> V | None: ...
+
+    @property
+    def generation(self) -> int: ...
+
+    def set(self, key: K, value: V, generation: int | None = None) -> None: ...
+
+    def pop(self, key: K) -> None: ...
+
+
+class TTLCache[K, V]:
+    """In-process LRU mapping whose entries expire ``ttl`` seconds after being stored.
+
+    Besides ``max_size`` entries, the cache can be bounded by ``max_bytes`` as measured by ``sizeof``,
+    which suits values that vary a lot in size. ``on_evict`` is told about entries pushed out by these limits.
+
+    A value loaded from elsewhere can go stale before it is stored, if its key is invalidated meanwhile.
+    Passing ``set`` the ``generation`` read before the load skips storing it then. The latest invalidations
+    are remembered per key, up to ``max_size`` of them; older ones count as having happened at once.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        max_bytes: int = 0,
+        sizeof: typing.Callable[[V], int] | None = None,
+        on_evict: typing.Callable[[K, V], None] | None = None,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.on_evict = on_evict
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size_bytes = 0
+        self._data: OrderedDict[K, tuple[float, V, int]] = OrderedDict()
+        self._generation = 0
+        self._invalidated_at: OrderedDict[K, int] = OrderedDict()
+        self._forgotten_generation = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: K) -> V | None:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value, _ = entry
+        if expires_at <= time.monotonic():
+            self._remove(key)
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def set(self, key: K, value: V, generation: int | None = None) -> None:
+        if self.max_size <= 0:
+            return
+        if generation is not None and self._invalidated_at.get(key, self._forgotten_generation) > generation:
+            return
+        size = self.sizeof(value) if self.sizeof is not None else 0
+        if self.max_bytes and size > self.max_bytes:
+            self._discard(key)
+            return
+        self._discard(key)
+        self._data[key] = (time.monotonic() + self.ttl, value, size)
+        self.size_bytes += size
+        while len(self._data) > self.max_size or (self.max_bytes and self.size_bytes > self.max_bytes):
+            evicted_key = next(iter(self._data))
+            _, evicted, _ = self._data[evicted_key]
+            self._remove(evicted_key)
+            self.evictions += 1
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted)
+
+    def pop(self, key: K) -> None:
+        # the key may be missing only because its value is being loaded, so the invalidation is recorded anyway
+        self._invalidate(key)
+        self._discard(key)
+
+    def discard_where(self, predicate: typing.Callable[[V], bool]) -> None:
+        for key in [key for key, (_, value, _) in self._data.items() if predicate(value)]:
+            self._invalidate(key)
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._generation += 1
+        self._forgotten_generation = self._generation
+        self._invalidated_at.clear()
+        self._data.clear()
+        self.size_bytes = 0
+
+    def _invalidate(self, key: K) -> None:
+        self._generation += 1
+        self._invalidated_at[key] = self._generation
+        self._invalidated_at.move_to_end(key)
+        while len(self._invalidated_at) > self.max_size:
+            _, self._forgotten_generation = self._invalidated_at.popitem(last=False)
+
+    def _discard(self, key: K) -> None:
+        if key in self._data:
+            self._remove(key)
+
+    def _remove(self, key: K) -> None:
+        _, _, size = self._data.pop(key)
+        self.size_bytes -= size
+
+
+class TokenRevocations:
+    """Moments up to which the tokens of a user can no longer be trusted by their claims alone.
+
+    Revocations are kept for ``ttl`` seconds, the longest token lifetime. One lost earlier, pushed out by
+    ``max_size`` or missed while change notifications were down, raises ``distrusted_until`` instead,
+    so that no token issued before it is trusted without looking its user up.
+    """
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.distrusted_until = 0.0
+        self._revoked_at: TTLCache[int, float] = TTLCache(
+            max_size=max_size, ttl=ttl, on_evict=lambda _, revoked_at: self.distrust_until(revoked_at)
+        )
+
+    def __len__(self) -> int:
+        return len(self._revoked_at)
+
+    def revoke(self, user_id: int, at: float) -> None:
+        if self._revoked_at.max_size <= 0:
+            self.distrust_until(at)
+            return
+        self._revoked_at.set(user_id, max(at, self._revoked_at.get(user_id) or at))
+
+    def distrust_until(self, at: float) -> None:
+        self.distrusted_until = max(self.distrusted_until, at)
+
+    def is_revoked(self, user_id: int, issued_at: float | None) -> bool:
+        if issued_at is None or issued_at <= self.distrusted_until:
+            return True
+        revoked_at = self._revoked_at.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
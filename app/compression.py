@@ -0,0 +1,101 @@
+import typing
+import zlib
+from collections.abc import Callable, Coroutine
+
+import brotli
+import fastapi
+import zstandard
+from fastapi import status
+from fastapi.routing import APIRoute
+
+from app.error_messages import RequestErrorMessages as Errors
+from app.settings import settings
+
+
+# zstd can expand a 4-byte block into 128 KiB, so its input is fed in small steps to bound the overshoot
+ZSTD_INPUT_STEP = 256
+
+
+def _too_large() -> fastapi.HTTPException:
+    return fastapi.HTTPException(status_code=status.HTTP_413_CONTENT_TOO_LARGE, detail=Errors.body_too_large)
+
+
+def _gunzip(body: bytes, max_size: int) -> bytes:
+    decompressor = zlib.decompressobj(wbits=16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, max_size + 1)
+    if len(data) > max_size:
+        raise _too_large()
+    # like brotli, anything after the end of the stream makes the body malformed rather than being ignored
+    if not decompressor.eof or decompressor.unused_data:
+        raise zlib.error
+    return data
+
+
+def _unbrotli(body: bytes, max_size: int) -> bytes:
+    decompressor = brotli.Decompressor()
+    data = decompressor.process(body, output_buffer_limit=max_size + 1)
+    if len(data) > max_size:
+        raise _too_large()
+    if not decompressor.is_finished():
+        raise brotli.error
+    return data
+
+
+def _unzstd(body: bytes, max_size: int) -> bytes:
+    decompressor = zstandard.ZstdDecompressor().decompressobj()
+    chunks, size = [], 0
+    for start in range(0, len(body), ZSTD_INPUT_STEP):
+        chunk = decompressor.decompress(body[start : start + ZSTD_INPUT_STEP])
+        size += len(chunk)
+        if size > max_size:
+            raise _too_large()
+        chunks.append(chunk)
+    if not decompressor.eof or decompressor.unused_data:
+        raise zstandard.ZstdError
+    return b"".join(chunks)
+
+
+DECOMPRESSORS: typing.Final[dict[str, Callable[[bytes, int], bytes]]] = {
+    "gzip": _gunzip,
+    "br": _unbrotli,
+    "zstd": _unzstd,
+}
+
+
+def decompress(body: bytes, encoding: str, max_size: int) -> bytes:
+    """Decode a request body sent with ``Content-Encoding``, refusing to inflate it beyond ``max_size`` bytes."""
+    encoding = encoding.strip().lower()
+    if encoding in {"", "identity"}:
+        return body
+    decompressor = DECOMPRESSORS.get(encoding)
+    if decompressor is None:
+        raise fastapi.HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=Errors.unsupported_encoding,
+            headers={"Accept-Encoding": ", ".join(DECOMPRESSORS)},
+        )
+    try:
+        return decompressor(body, max_size)
+    except (zlib.error, brotli.error, zstandard.ZstdError):
+        raise fastapi.HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=Errors.malformed_body) from None
+
+
+class DecompressingRequest(fastapi.Request):
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            encoding = self.headers.get("Content-Encoding", "")
+            self._body = decompress(body, encoding, settings.request_max_decompressed_size)
+        return self._body
+
+
+class DecompressingRoute(APIRoute):
+    """Route that accepts gzip, brotli and zstd compressed request bodies."""
+
+    def get_route_handler(self) -> Callable[[fastapi.Request], Coroutine[typing.Any, typing.Any, fastapi.Response]]:
+        handler = super().get_route_handler()
+
+        async def decompressing_handler(request: fastapi.Request) -> fastapi.Response:
+            return await handler(DecompressingRequest(request.scope, request.receive))
+
+        return decompressing_handler
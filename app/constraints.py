@@ -1,6 +1,12 @@
 class NotesConstraints:
     max_title_length = 256
     max_body_length = 65536
+    max_search_query_length = 256
+    search_config = "simple"
+    max_bulk_items = 500
+    max_preview_length = 1024
+    default_page_size = 20
+    max_page_size = 100
 
 
 class UsersConstraints:
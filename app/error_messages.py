@@ -2,8 +2,22 @@ class NotesErrorMessages:
     note_not_found = "Note is not found"
     access_denied_only_owner = "Only the owner of the note can perform this action"
     access_denied_only_admin = "Only admin can perform this action"
+    invalid_cursor = "Pagination cursor is invalid"
+    precondition_failed = "Note has been modified since it was last fetched"
+    unsupported_import_type = "Notes can be imported from application/x-ndjson or text/csv bodies"
+    invalid_import_header = "CSV header must contain title and body columns"
+    import_line_too_long = "Line is too long"
+    import_line_not_utf8 = "Line is not valid UTF-8"
+    import_unterminated_quote = "Quoted CSV field is not terminated"
 
 
 class UserErrorMessages:
     wrong_login_pass = "Incorrect login or password"
     invalid_token = "Could not validate credentials"
+    login_busy = "Too many logins are in progress, try again later"
+
+
+class RequestErrorMessages:
+    unsupported_encoding = "Content encoding is not supported"
+    malformed_body = "Request body could not be decompressed"
+    body_too_large = "Decompressed request body is too large"
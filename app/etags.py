@@ -0,0 +1,54 @@
+import datetime as dt
+import hashlib
+
+
+_EPOCH = dt.datetime(1970, 1, 1, tzinfo=dt.UTC)
+_WEAK_PREFIX = "W/"
+
+
+def note_etag(note_id: int, updated_at: dt.datetime) -> str:
+    """Strong ETag of a single note, from which ``parse_note_etag`` recovers the version it was built from."""
+    return f'"{note_id}.{(updated_at - _EPOCH) // dt.timedelta(microseconds=1)}"'
+
+
+def parse_note_etag(etag: str) -> tuple[int, dt.datetime] | None:
+    try:
+        note_id, microseconds = etag.removeprefix('"').removesuffix('"').split(".")
+        return int(note_id), _EPOCH + dt.timedelta(microseconds=int(microseconds))
+    except (ValueError, OverflowError):
+        return None
+
+
+def list_etag(*parts: object) -> str:
+    """Weak ETag of a list page, derived from everything that determines its content.
+
+    It stands for the page rather than for its bytes, which differ between content codings.
+    """
+    return f'{_WEAK_PREFIX}"{hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()}"'
+
+
+def split_etags(header: str) -> list[str]:
+    return [etag.strip() for etag in header.split(",") if etag.strip()]
+
+
+def none_match(header: str | None, etag: str) -> bool:
+    """Evaluate ``If-None-Match`` with the weak comparison RFC 9110 prescribes for it."""
+    if header is None:
+        return True
+    if header.strip() == "*":
+        return False
+    etag = etag.removeprefix(_WEAK_PREFIX)
+    return all(candidate.removeprefix(_WEAK_PREFIX) != etag for candidate in split_etags(header))
+
+
+def if_match_versions(header: str | None, note_id: int) -> list[dt.datetime] | None:
+    """Versions of ``note_id`` an ``If-Match`` header accepts, or ``None`` when any version is acceptable."""
+    if header is None or header.strip() == "*":
+        return None
+    versions = []
+    for candidate in split_etags(header):
+        # If-Match uses the strong comparison, so weak validators never match
+        parsed = None if candidate.startswith(_WEAK_PREFIX) else parse_note_etag(candidate)
+        if parsed is not None and parsed[0] == note_id:
+            versions.append(parsed[1])
+    return versions
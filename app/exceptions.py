@@ -1,2 +1,18 @@
 class AccessDeniedError(Exception):
     pass
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+class PreconditionFailedError(Exception):
+    pass
+
+
+class PasswordHasherBusyError(Exception):
+    pass
+
+
+class InvalidImportHeaderError(Exception):
+    pass
@@ -0,0 +1,146 @@
+import csv
+import enum
+from collections.abc import AsyncIterable, AsyncIterator
+from dataclasses import dataclass
+
+import pydantic
+
+from app import schemas
+from app.error_messages import NotesErrorMessages as Errors
+from app.exceptions import InvalidImportHeaderError
+
+
+class ImportFormat(enum.StrEnum):
+    ndjson = "application/x-ndjson"
+    csv = "text/csv"
+
+    @classmethod
+    def from_content_type(cls, content_type: str) -> "ImportFormat | None":
+        media_type = content_type.partition(";")[0].strip().lower()
+        return cls(media_type) if media_type in cls else None
+
+
+CSV_COLUMNS = ("title", "body")
+
+
+@dataclass(frozen=True, slots=True)
+class ImportedLine:
+    line: int
+    note: schemas.NoteCreate | None = None
+    error: str | None = None
+
+
+def format_validation_error(exc: pydantic.ValidationError) -> str:
+    return "; ".join(
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" if error["loc"] else error["msg"]
+        for error in exc.errors(include_url=False)
+    )
+
+
+async def split_lines(chunks: AsyncIterable[bytes], max_line_size: int) -> AsyncIterator[tuple[int, bytes | None]]:
+    """Split a byte stream into numbered lines, yielding ``None`` for lines longer than ``max_line_size``."""
+    buffer = bytearray()
+    line_number = 0
+    overflowed = False
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, rest = buffer.split(b"\n")
+        for line in lines:
+            line_number += 1
+            too_long = overflowed or len(line) > max_line_size
+            overflowed = False
+            yield line_number, None if too_long else bytes(line.removesuffix(b"\r"))
+        buffer = rest
+        if len(buffer) > max_line_size:
+            # the rest of an overlong line is dropped as it arrives instead of being buffered
+            overflowed = True
+            buffer.clear()
+    if buffer or overflowed:
+        yield line_number + 1, None if overflowed else bytes(buffer.removesuffix(b"\r"))
+
+
+async def parse_ndjson(lines: AsyncIterable[tuple[int, bytes | None]]) -> AsyncIterator[ImportedLine]:
+    async for line_number, line in lines:
+        if line is None:
+            yield ImportedLine(line_number, error=Errors.import_line_too_long)
+        elif line.strip():
+            try:
+                yield ImportedLine(line_number, note=schemas.NoteCreate.model_validate_json(line))
+            except pydantic.ValidationError as exc:
+                yield ImportedLine(line_number, error=format_validation_error(exc))
+
+
+async def csv_records(
+    lines: AsyncIterable[tuple[int, bytes | None]], max_record_size: int
+) -> AsyncIterator[tuple[int, list[str] | str]]:
+    """Join physical lines into CSV records, which may span lines inside quoted fields.
+
+    A record is complete once it holds an even number of quotes, as quotes inside fields are doubled.
+    Yields the number of the first line of every record with its fields or with an error message.
+    """
+    pending: list[bytes] = []
+    start, size, quotes, overflowed = 0, 0, 0, False
+    async for line_number, line in lines:
+        if not pending and not overflowed:
+            start = line_number
+        if line is None:
+            # the quotes of an overlong line are unknown, so it is taken to end the record
+            pending.clear()
+            size, quotes, overflowed = 0, 0, False
+            yield start, Errors.import_line_too_long
+            continue
+        size += len(line)
+        quotes += line.count(b'"')
+        overflowed = overflowed or size > max_record_size
+        if overflowed:
+            pending.clear()
+        else:
+            pending.append(line)
+        if quotes % 2:
+            continue
+        record = b"\n".join(pending)
+        pending.clear()
+        if overflowed:
+            size, quotes, overflowed = 0, 0, False
+            yield start, Errors.import_line_too_long
+            continue
+        size, quotes = 0, 0
+        try:
+            text = record.decode()
+        except UnicodeDecodeError:
+            yield start, Errors.import_line_not_utf8
+            continue
+        if text.strip():
+            yield start, next(csv.reader([text]))
+    if pending or overflowed:
+        yield start, Errors.import_unterminated_quote
+
+
+async def parse_csv(
+    lines: AsyncIterable[tuple[int, bytes | None]], max_record_size: int
+) -> AsyncIterator[ImportedLine]:
+    columns: list[str] | None = None
+    async for line_number, record in csv_records(lines, max_record_size):
+        if columns is None:
+            if isinstance(record, str) or not set(CSV_COLUMNS) <= {column.strip() for column in record}:
+                raise InvalidImportHeaderError
+            columns = [column.strip() for column in record]
+        elif isinstance(record, str):
+            yield ImportedLine(line_number, error=record)
+        else:
+            try:
+                yield ImportedLine(
+                    line_number, note=schemas.NoteCreate.model_validate(dict(zip(columns, record, strict=False)))
+                )
+            except pydantic.ValidationError as exc:
+                yield ImportedLine(line_number, error=format_validation_error(exc))
+
+
+def parse_notes(
+    chunks: AsyncIterable[bytes], import_format: ImportFormat, max_line_size: int
+) -> AsyncIterator[ImportedLine]:
+    """Validate notes from an uploaded body one line or record at a time, without reading it all first."""
+    lines = split_lines(chunks, max_line_size)
+    if import_format == ImportFormat.csv:
+        return parse_csv(lines, max_line_size)
+    return parse_ndjson(lines)
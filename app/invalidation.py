@@ -0,0 +1,107 @@
+import asyncio
+import contextlib
+import enum
+import json
+import time
+import typing
+from collections.abc import Callable, Sequence
+
+import sqlalchemy as sa
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+
+# keeps every payload well below the 8000 bytes Postgres allows for a notification
+MAX_IDS_PER_NOTIFICATION = 500
+
+
+class ChangeKind(enum.StrEnum):
+    note = "note"
+    user = "user"
+
+
+type ChangeHandler = Callable[[list[int], float], None]
+
+
+class ChangeNotifier:
+    """Publishes ids of changed rows on a Postgres channel, so that other processes can drop their cached copies."""
+
+    def __init__(self, channel: str) -> None:
+        self.channel = channel
+
+    async def notify(self, session: AsyncSession, kind: ChangeKind, ids: Sequence[int]) -> None:
+        # NOTIFY is transactional: listeners only hear about the change once it has been committed
+        changed_at = time.time()
+        for start in range(0, len(ids), MAX_IDS_PER_NOTIFICATION):
+            payload = json.dumps(
+                {"kind": kind, "ids": list(ids[start : start + MAX_IDS_PER_NOTIFICATION]), "at": changed_at}
+            )
+            await session.execute(sa.select(sa.func.pg_notify(self.channel, payload)))
+
+
+class ChangeListener:
+    """Background task that LISTENs on the change channel and hands received ids to ``handlers``.
+
+    Notifications sent while the listener is disconnected are lost, so ``on_reset`` is called
+    whenever it (re)subscribes, letting the caller drop everything it may have missed.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        channel: str,
+        handlers: dict[ChangeKind, ChangeHandler],
+        on_reset: Callable[[], None],
+        reconnect_delay: float,
+    ) -> None:
+        self.engine = engine
+        self.channel = channel
+        self.handlers = handlers
+        self.on_reset = on_reset
+        self.reconnect_delay = reconnect_delay
+        self.ready = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run(), name="change-listener")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except Exception:  # noqa: BLE001
+                logger.exception("Change listener has lost its connection")
+            self.ready.clear()
+            await asyncio.sleep(self.reconnect_delay)
+
+    async def _listen(self) -> None:
+        async with self.engine.connect() as connection:
+            raw_connection = (await connection.get_raw_connection()).driver_connection
+            closed = asyncio.Event()
+            raw_connection.add_termination_listener(lambda _: closed.set())
+            await raw_connection.add_listener(self.channel, self._on_notification)
+            try:
+                self.on_reset()
+                self.ready.set()
+                logger.info(f"Change listener has subscribed to '{self.channel}'")
+                await closed.wait()
+            finally:
+                if not raw_connection.is_closed():
+                    await raw_connection.remove_listener(self.channel, self._on_notification)
+
+    def _on_notification(self, *args: typing.Any) -> None:  # noqa: ANN401
+        *_, payload = args
+        try:
+            message = json.loads(payload)
+            handler = self.handlers[ChangeKind(message["kind"])]
+            ids, changed_at = [int(item) for item in message["ids"]], float(message["at"])
+        except (ValueError, KeyError, TypeError):
+            logger.warning(f"Change listener has received a malformed notification: {payload!r}")
+            return
+        handler(ids, changed_at)
@@ -1,12 +1,60 @@
 from modern_di import BaseGraph, Scope, providers
 
 from app import repositories
+from app.cache import TokenRevocations, TTLCache
+from app.invalidation import ChangeNotifier
 from app.resources.db import create_sa_engine, create_session
+from app.resources.invalidation import create_change_listener
+from app.resources.passwords import create_password_hasher
+from app.settings import settings
 
 
 class Dependencies(BaseGraph):
     database_engine = providers.Resource(Scope.APP, create_sa_engine)
     session = providers.Resource(Scope.REQUEST, create_session, engine=database_engine.cast)
+    password_hasher = providers.Resource(Scope.APP, create_password_hasher)
+    principals_cache = providers.Singleton(
+        Scope.APP, TTLCache, max_size=settings.auth_cache_max_size, ttl=settings.auth_cache_ttl_seconds
+    )
+    token_revocations = providers.Singleton(
+        Scope.APP,
+        TokenRevocations,
+        max_size=settings.jwt_revocations_max_size,
+        ttl=settings.jwt_max_token_lifetime_seconds,
+    )
 
-    notes_service = providers.Factory(Scope.REQUEST, repositories.NotesService, session=session.cast, auto_commit=True)
-    users_service = providers.Factory(Scope.REQUEST, repositories.UsersService, session=session.cast, auto_commit=True)
+    notes_cache = providers.Singleton(
+        Scope.APP,
+        TTLCache,
+        max_size=settings.notes_cache_max_size,
+        ttl=settings.notes_cache_ttl_seconds,
+        max_bytes=settings.notes_cache_max_bytes,
+        sizeof=repositories.note_snapshot_size,
+    )
+    change_notifier = providers.Singleton(Scope.APP, ChangeNotifier, channel=settings.cache_invalidation_channel)
+    change_listener = providers.Resource(
+        Scope.APP,
+        create_change_listener,
+        engine=database_engine.cast,
+        notes_cache=notes_cache.cast,
+        principals_cache=principals_cache.cast,
+        token_revocations=token_revocations.cast,
+    )
+
+    notes_service = providers.Factory(
+        Scope.REQUEST,
+        repositories.NotesService,
+        session=session.cast,
+        cache=notes_cache.cast,
+        notifier=change_notifier.cast,
+        auto_commit=True,
+    )
+    users_service = providers.Factory(
+        Scope.REQUEST,
+        repositories.UsersService,
+        session=session.cast,
+        principals_cache=principals_cache.cast,
+        token_revocations=token_revocations.cast,
+        notifier=change_notifier.cast,
+        auto_commit=True,
+    )
@@ -0,0 +1,165 @@
+import typing
+from collections.abc import Iterator
+
+from prometheus_client import REGISTRY, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, Metric
+from prometheus_client.registry import Collector
+from sqlalchemy.pool import QueuePool
+from starlette.routing import Match
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+
+if typing.TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine
+
+    from app.action_log import BatchingFileSink
+    from app.cache import TTLCache
+    from app.passwords import PasswordHasher
+
+
+# Values live in the memory of the process that records them, like those of prometheus_fastapi_instrumentator,
+# which is why an instance runs a single Granian worker (APP_WORKERS=1) and scales out with replicas.
+HTTP_REQUEST_DB_QUERIES: typing.Final = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed while handling a request",
+    ["handler"],
+    buckets=(0, 1, 2, 3, 4, 5, 7, 10, 15, 20, 50, 100),
+)
+HTTP_REQUEST_DB_SECONDS: typing.Final = Histogram(
+    "http_request_db_seconds",
+    "Time spent executing SQL statements while handling a request",
+    ["handler"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_WAIT_SECONDS: typing.Final = Histogram(
+    "db_pool_wait_seconds",
+    "Time spent getting a connection from the SQLAlchemy pool, including opening a new one",
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+)
+PASSWORD_HASHER_SECONDS: typing.Final = Histogram(
+    "password_hasher_duration_seconds",
+    "Time argon2 spends on one hash or verification, without waiting for a free worker",
+    ["operation"],
+    buckets=(0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.2, 0.3, 0.5, 1, 2.5),
+)
+
+
+def route_template(scope: Scope) -> str:
+    # FastAPI routes store themselves in the scope once matched, others are only found by matching again
+    if (route := scope.get("route")) is not None:
+        return typing.cast("str", route.path)
+    for route in scope["app"].routes:
+        match, _ = route.matches(scope)
+        if match != Match.NONE:
+            return typing.cast("str", route.path)
+    return "none"
+
+
+class InFlightRequests(Collector):
+    """Counts unfinished requests per route template.
+
+    The route is unknown until the router has matched it, so requests are only tracked while they run
+    and labelled when scraped. ``prometheus_fastapi_instrumentator`` rather matches every request
+    against all routes up front, and always registers its gauge in the global registry, which fails
+    once a second application is built in the same process.
+    """
+
+    def __init__(self) -> None:
+        self.scopes: dict[int, Scope] = {}
+        self.handlers: set[tuple[str, str]] = set()
+
+    def track(self, scope: Scope) -> None:
+        self.scopes[id(scope)] = scope
+
+    def untrack(self, scope: Scope) -> None:
+        del self.scopes[id(scope)]
+        # finished handlers keep being reported, at zero
+        self.handlers.add((scope["method"], route_template(scope)))
+
+    def collect(self) -> Iterator[Metric]:
+        counts = dict.fromkeys(self.handlers.copy(), 0)
+        for scope in self.scopes.copy().values():
+            labels = (scope["method"], route_template(scope))
+            counts[labels] = counts.get(labels, 0) + 1
+        in_flight = GaugeMetricFamily(
+            "http_requests_in_flight", "Requests being handled right now", labels=["method", "handler"]
+        )
+        for labels, value in counts.items():
+            in_flight.add_metric(list(labels), value)
+        yield in_flight
+
+
+HTTP_REQUESTS_IN_FLIGHT: typing.Final = InFlightRequests()
+REGISTRY.register(HTTP_REQUESTS_IN_FLIGHT)
+
+
+class InFlightMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        HTTP_REQUESTS_IN_FLIGHT.track(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            HTTP_REQUESTS_IN_FLIGHT.untrack(scope)
+
+
+class RuntimeCollector(Collector):
+    """Reports the state of pools, queues and caches when scraped, so that the request path does not pay for it."""
+
+    def __init__(
+        self,
+        engine: "AsyncEngine",
+        password_hasher: "PasswordHasher",
+        action_log: "BatchingFileSink",
+        caches: "dict[str, TTLCache[typing.Any, typing.Any]]",
+    ) -> None:
+        self.engine = engine
+        self.password_hasher = password_hasher
+        self.action_log = action_log
+        self.caches = caches
+
+    def collect(self) -> Iterator[Metric]:
+        pool = self.engine.pool
+        if isinstance(pool, QueuePool):
+            yield GaugeMetricFamily("db_pool_size", "Connections the pool keeps open", value=pool.size())
+            yield GaugeMetricFamily("db_pool_checked_out", "Connections in use", value=pool.checkedout())
+            yield GaugeMetricFamily("db_pool_checked_in", "Idle connections in the pool", value=pool.checkedin())
+            # negative until the pool has opened all of its regular connections
+            yield GaugeMetricFamily(
+                "db_pool_overflow", "Connections opened beyond the pool size", value=pool.overflow()
+            )
+
+        yield GaugeMetricFamily(
+            "password_hasher_in_flight", "Hashes and verifications submitted", value=self.password_hasher.in_flight
+        )
+        yield GaugeMetricFamily(
+            "password_hasher_queue_depth",
+            "Hashes and verifications waiting for a free worker",
+            value=self.password_hasher.queue_depth,
+        )
+
+        yield GaugeMetricFamily(
+            "actions_log_queue_depth", "Action log records waiting to be written", value=self.action_log.queue_depth
+        )
+        yield CounterMetricFamily(
+            "actions_log_dropped", "Action log records dropped on a full queue", value=self.action_log.dropped
+        )
+
+        hits = CounterMetricFamily("cache_hits", "Cache lookups that found a fresh entry", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "Cache lookups that found nothing", labels=["cache"])
+        evictions = CounterMetricFamily("cache_evictions", "Entries evicted to stay within limits", labels=["cache"])
+        entries = GaugeMetricFamily("cache_entries", "Entries held by the cache", labels=["cache"])
+        size = GaugeMetricFamily("cache_size_bytes", "Estimated size of the cached values", labels=["cache"])
+        for name, cache in self.caches.items():
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            evictions.add_metric([name], cache.evictions)
+            entries.add_metric([name], len(cache))
+            size.add_metric([name], cache.size_bytes)
+        yield from (hits, misses, evictions, entries, size)
@@ -1,12 +1,25 @@
 import sqlalchemy as sa
 from advanced_alchemy.base import BigIntAuditBase
 from sqlalchemy import orm
+from sqlalchemy.dialects import postgresql
 
 from app.constraints import NotesConstraints as Constraints
 
 
 class Note(BigIntAuditBase):
     __tablename__ = "notes"
+    __table_args__ = (
+        sa.Index(
+            "ix_notes_author_id_created_at_id",
+            "author_id",
+            "created_at",
+            "id",
+            postgresql_where=sa.text("NOT is_deleted"),
+        ),
+        sa.Index("ix_notes_search_vector", "search_vector", postgresql_using="gin"),
+        # finds the latest change among the notes of an author, deleted ones included, for list ETags
+        sa.Index("ix_notes_author_id_updated_at", "author_id", "updated_at"),
+    )
 
     title: orm.Mapped[str] = orm.mapped_column(
         sa.String(length=Constraints.max_title_length),
@@ -25,3 +38,12 @@ class Note(BigIntAuditBase):
         nullable=False,
         default=False,
     )
+    # filled from title and body with the ``search_config`` weights by the notes_search_vector_update trigger
+    search_vector: orm.Mapped[str | None] = orm.mapped_column(
+        postgresql.TSVECTOR(),
+        server_default=sa.FetchedValue(),
+        server_onupdate=sa.FetchedValue(),
+        deferred=True,
+    )
+    # filled in only by queries that ask for it, see ``NotesRepository.summary_statement``
+    body_preview: orm.Mapped[str | None] = orm.query_expression()
@@ -0,0 +1,128 @@
+import base64
+import datetime as dt
+import enum
+import json
+import typing
+from dataclasses import dataclass
+
+import sqlalchemy as sa
+from advanced_alchemy.filters import LimitOffset, PaginationFilter
+from fastapi import Query
+
+from app.constraints import NotesConstraints
+from app.exceptions import InvalidCursorError
+
+
+if typing.TYPE_CHECKING:
+    from advanced_alchemy.filters import ModelT, StatementTypeT
+
+
+MIN_ID: typing.Final = -(2**63)
+MAX_ID: typing.Final = 2**63 - 1
+
+
+class PaginationType(enum.StrEnum):
+    limit_offset = "limit_offset"
+    cursor = "cursor"
+
+
+class CountMode(enum.StrEnum):
+    """How the total of a ``limit_offset`` page is found: counted, taken from planner statistics or skipped."""
+
+    exact = "exact"
+    estimate = "estimate"
+    none = "none"
+
+
+@dataclass
+class PaginationParams:
+    pagination_type: typing.Annotated[PaginationType, Query(alias="paginationType")] = PaginationType.limit_offset
+    cursor: str | None = None
+    count: CountMode = CountMode.exact
+
+
+@dataclass
+class SearchParams:
+    q: typing.Annotated[str, Query(min_length=1, max_length=NotesConstraints.max_search_query_length)]
+    cursor: str | None = None
+    page_size: typing.Annotated[int, Query(ge=1, le=NotesConstraints.max_page_size, alias="pageSize")] = (
+        NotesConstraints.default_page_size
+    )
+
+
+def provide_limit_offset(
+    current_page: typing.Annotated[
+        int, Query(ge=1, alias="currentPage", description="Page number for pagination.")
+    ] = 1,
+    page_size: typing.Annotated[
+        int,
+        Query(ge=1, le=NotesConstraints.max_page_size, alias="pageSize", description="Number of items per page."),
+    ] = NotesConstraints.default_page_size,
+) -> LimitOffset:
+    """Provide ``LimitOffset`` like advanced_alchemy's ``provide_filters`` does, with a bounded page size."""
+    return LimitOffset(limit=page_size, offset=page_size * (current_page - 1))
+
+
+def _encode_position(position: list[typing.Any]) -> str:
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def _decode_position(cursor: str) -> typing.Any:  # noqa: ANN401
+    try:
+        return json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except ValueError:
+        raise InvalidCursorError from None
+
+
+def _check_id(item_id: int) -> int:
+    # ids are bigints, a cursor pointing past them would only fail once sent to the database
+    if not MIN_ID <= item_id <= MAX_ID:
+        raise InvalidCursorError
+    return item_id
+
+
+def encode_cursor(created_at: dt.datetime, item_id: int) -> str:
+    return _encode_position([created_at.isoformat(), item_id])
+
+
+def decode_cursor(cursor: str) -> tuple[dt.datetime, int]:
+    try:
+        created_at, item_id = _decode_position(cursor)
+        position = dt.datetime.fromisoformat(created_at), _check_id(int(item_id))
+    except (ValueError, TypeError, OverflowError):
+        raise InvalidCursorError from None
+    if position[0].tzinfo is None:
+        raise InvalidCursorError
+    return position
+
+
+def encode_rank_cursor(rank: float, item_id: int) -> str:
+    return _encode_position([rank, item_id])
+
+
+def decode_rank_cursor(cursor: str) -> tuple[float, int]:
+    try:
+        rank, item_id = _decode_position(cursor)
+        return float(rank), _check_id(int(item_id))
+    except (ValueError, TypeError, OverflowError):
+        raise InvalidCursorError from None
+
+
+@dataclass
+class KeysetPagination(PaginationFilter):
+    """Keyset pagination over ``(created_at, id)``.
+
+    Unlike ``LimitOffset`` the cost of a page does not depend on its position,
+    because the database seeks straight to ``after`` instead of skipping rows.
+    """
+
+    limit: int
+    after: tuple[dt.datetime, int] | None = None
+
+    def append_to_statement(self, statement: "StatementTypeT", model: "type[ModelT]") -> "StatementTypeT":
+        if isinstance(statement, sa.Select):
+            created_at, item_id = model.created_at, model.id  # type: ignore[attr-defined]
+            if self.after is not None:
+                statement = statement.where(sa.tuple_(created_at, item_id) > self.after)
+            statement = statement.order_by(created_at, item_id).limit(self.limit)
+        return statement
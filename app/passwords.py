@@ -0,0 +1,54 @@
+import asyncio
+import time
+import typing
+from concurrent.futures import ThreadPoolExecutor
+
+from advanced_alchemy.types.password_hash.base import HashedPassword
+
+from app.exceptions import PasswordHasherBusyError
+from app.metrics import PASSWORD_HASHER_SECONDS
+from app.models.users import pwd_context
+
+
+class PasswordHasher:
+    """Runs argon2 hashing and verification on a bounded thread pool instead of the event loop.
+
+    At most ``max_queue`` operations wait for a free worker, beyond that ``PasswordHasherBusyError`` is raised
+    right away, so that a burst of logins is turned down instead of piling up behind the pool.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int) -> None:
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hasher")
+
+    @property
+    def queue_depth(self) -> int:
+        """Number of submitted operations still waiting for a free worker."""
+        return max(self.in_flight - self.max_workers, 0)
+
+    async def _run[**P, T](self, operation: str, func: typing.Callable[P, T], *args: P.args, **kwargs: P.kwargs) -> T:
+        def timed() -> T:
+            started_at = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                PASSWORD_HASHER_SECONDS.labels(operation).observe(time.perf_counter() - started_at)
+
+        if self.in_flight >= self.max_workers + self.max_queue:
+            raise PasswordHasherBusyError
+        self.in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, timed)
+        finally:
+            self.in_flight -= 1
+
+    async def verify(self, hashed: HashedPassword, plain: str) -> bool:
+        return await self._run("verify", hashed.verify, plain)
+
+    async def hash(self, plain: str) -> str:
+        return await self._run("hash", pwd_context.hash, plain)
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=True)
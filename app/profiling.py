@@ -0,0 +1,119 @@
+import asyncio
+import datetime as dt
+import pathlib
+import re
+import typing
+import urllib.parse
+
+import modern_di_fastapi
+from fastapi.security.utils import get_authorization_scheme_param
+from pyinstrument import Profiler
+from pyinstrument.renderers import SpeedscopeRenderer
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app import ioc
+from app.auth import decode_token, find_principal
+from app.repositories import UsersService
+from app.resources.db import open_session
+
+
+PROFILE_HEADER: typing.Final = b"x-profile"
+PROFILE_QUERY_FLAG: typing.Final = "profile"
+PROFILE_FILE_HEADER: typing.Final = "X-Profile-File"
+PROFILED_STATUS_HEADER: typing.Final = "X-Profiled-Status"
+FLAG_VALUES: typing.Final = frozenset({"1", "true", "yes"})
+
+
+def is_requested(scope: Scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1").lower() in FLAG_VALUES
+    query = urllib.parse.parse_qs(scope["query_string"].decode("latin-1"))
+    return any(value.lower() in FLAG_VALUES for value in query.get(PROFILE_QUERY_FLAG, []))
+
+
+async def is_admin(scope: Scope) -> bool:
+    """Authenticate the request the way ``get_current_user`` does, before any of it is handled."""
+    scheme, token = get_authorization_scheme_param(Headers(scope=scope).get("Authorization"))
+    token_data = decode_token(token) if scheme.lower() == "bearer" else None
+    # the role claim, when there is one, rules out other users without looking anything up
+    if token_data is None or token_data.role not in {None, "admin"}:
+        return False
+    container = modern_di_fastapi.fetch_di_container(scope["app"])
+    async with open_session(await ioc.Dependencies.database_engine.async_resolve(container)) as session:
+        principal = await find_principal(
+            token_data,
+            UsersService(session=session),
+            await ioc.Dependencies.principals_cache.async_resolve(container),
+            await ioc.Dependencies.token_revocations.async_resolve(container),
+        )
+    return principal is not None and principal.is_admin
+
+
+def profile_name(scope: Scope) -> str:
+    path = re.sub(r"[^\w-]+", "_", scope["path"]).strip("_") or "root"
+    return f"{dt.datetime.now(tz=dt.UTC):%Y%m%dT%H%M%S%f}-{scope['method'].lower()}-{path}.speedscope.json"
+
+
+class ProfilingMiddleware:
+    """Samples the call stack of requests that ask for it with the ``X-Profile`` header or the ``profile`` query flag.
+
+    Only requests of admins are profiled: the token is checked before the request is handled, and requests of anyone
+    else pass through untouched. The profile is a speedscope file (https://www.speedscope.app, also readable by other
+    flamegraph viewers) that replaces the response body, or, when ``output_dir`` is set, is written there and named
+    in the ``X-Profile-File`` header of the original response. Either way the response is buffered until the handler
+    is done.
+    """
+
+    def __init__(self, app: ASGIApp, interval: float, output_dir: str) -> None:
+        self.app = app
+        self.interval = interval
+        self.output_dir = pathlib.Path(output_dir) if output_dir else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not is_requested(scope) or not await is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        messages: list[Message] = []
+
+        async def buffer(message: Message) -> None:
+            messages.append(message)
+
+        # async mode attributes time spent awaiting to the awaiting frame of this request only
+        profiler = Profiler(interval=self.interval, async_mode="enabled")
+        profiler.start()
+        try:
+            await self.app(scope, receive, buffer)
+        finally:
+            session = profiler.stop()
+
+        profile = SpeedscopeRenderer().render(session)
+        name = profile_name(scope)
+        if self.output_dir is None:
+            response = Response(
+                profile,
+                media_type="application/json",
+                headers={
+                    "Content-Disposition": f'attachment; filename="{name}"',
+                    PROFILED_STATUS_HEADER: str(messages[0]["status"]),
+                },
+            )
+            await response(scope, receive, send)
+            return
+
+        await asyncio.to_thread(self.write, name, profile)
+        MutableHeaders(scope=messages[0])[PROFILE_FILE_HEADER] = name
+        await self.replay(messages, send)
+
+    def write(self, name: str, profile: str) -> None:
+        output_dir = typing.cast("pathlib.Path", self.output_dir)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        (output_dir / name).write_text(profile)
+
+    @staticmethod
+    async def replay(messages: list[Message], send: Send) -> None:
+        for message in messages:
+            await send(message)
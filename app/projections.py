@@ -0,0 +1,20 @@
+import enum
+import typing
+from dataclasses import dataclass
+
+from fastapi import Query
+
+from app.constraints import NotesConstraints
+
+
+class NoteFields(enum.StrEnum):
+    full = "full"
+    summary = "summary"
+
+
+@dataclass
+class ProjectionParams:
+    fields: NoteFields = NoteFields.full
+    preview_length: typing.Annotated[
+        int | None, Query(ge=1, le=NotesConstraints.max_preview_length, alias="previewLength")
+    ] = None
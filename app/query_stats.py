@@ -0,0 +1,86 @@
+import contextlib
+import contextvars
+import dataclasses
+import time
+import typing
+
+import sqlalchemy as sa
+from sqlalchemy.ext.asyncio import AsyncEngine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import HTTP_REQUEST_DB_QUERIES, HTTP_REQUEST_DB_SECONDS
+
+
+@dataclasses.dataclass
+class QueryStats:
+    count: int = 0
+    duration: float = 0  # seconds
+
+
+# every collector the current code runs under: the request's one and, in tests, the ones of assertions
+ACTIVE_STATS: contextvars.ContextVar[tuple[QueryStats, ...]] = contextvars.ContextVar("active_stats", default=())
+
+
+@contextlib.contextmanager
+def collect_queries() -> typing.Iterator[QueryStats]:
+    stats = QueryStats()
+    token = ACTIVE_STATS.set((*ACTIVE_STATS.get(), stats))
+    try:
+        yield stats
+    finally:
+        ACTIVE_STATS.reset(token)
+
+
+def track_queries(engine: AsyncEngine) -> None:
+    """Count statements executed on the engine's connections and the time they take, including failed ones."""
+
+    def before_cursor_execute(connection: sa.Connection, *_: typing.Any) -> None:  # noqa: ANN401
+        connection.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+    def after_cursor_execute(connection: sa.Connection, *_: typing.Any) -> None:  # noqa: ANN401
+        duration = time.perf_counter() - connection.info["query_started_at"].pop()
+        for stats in ACTIVE_STATS.get():
+            stats.count += 1
+            stats.duration += duration
+
+    def handle_error(context: sa.engine.ExceptionContext) -> None:
+        if context.connection is not None and context.connection.info.get("query_started_at"):
+            after_cursor_execute(context.connection)
+
+    sa.event.listen(engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    sa.event.listen(engine.sync_engine, "after_cursor_execute", after_cursor_execute)
+    sa.event.listen(engine.sync_engine, "handle_error", handle_error)
+
+
+class QueryStatsMiddleware:
+    """Reports how many statements a request has executed and for how long.
+
+    Totals go to Prometheus per route template; with ``server_timing`` they are also sent in the ``Server-Timing``
+    response header, which only covers the statements executed before the response has started.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message).append(
+                    "Server-Timing", f'db;dur={stats.duration * 1000:.3f};desc="{stats.count} queries"'
+                )
+            await send(message)
+
+        with collect_queries() as stats:
+            try:
+                await self.app(scope, receive, send_with_timing if self.server_timing else send)
+            finally:
+                route = scope.get("route")
+                handler = route.path if route is not None else "none"
+                HTTP_REQUEST_DB_QUERIES.labels(handler).observe(stats.count)
+                HTTP_REQUEST_DB_SECONDS.labels(handler).observe(stats.duration)
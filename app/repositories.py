@@ -1,67 +1,325 @@
-from typing import TYPE_CHECKING
+import datetime as dt
+import sys
+import time
+from collections.abc import AsyncIterator, Sequence
+from typing import TYPE_CHECKING, Any, NoReturn
 
+import sqlalchemy as sa
+from advanced_alchemy.exceptions import NotFoundError
 from advanced_alchemy.repository import SQLAlchemyAsyncRepository
 from advanced_alchemy.service import SQLAlchemyAsyncRepositoryService
-from sqlalchemy import true
+from sqlalchemy import orm, true
 from sqlalchemy.sql import not_
 
-from app import models
-from app.exceptions import AccessDeniedError
+from app import models, schemas
+from app.cache import Cache, TokenRevocations, TTLCache
+from app.constraints import NotesConstraints
+from app.exceptions import AccessDeniedError, PreconditionFailedError
+from app.invalidation import ChangeKind, ChangeNotifier
+from app.pagination import KeysetPagination, decode_cursor, decode_rank_cursor, encode_cursor, encode_rank_cursor
 
 
 if TYPE_CHECKING:
     from advanced_alchemy.service.typing import ModelDictT
 
 
+NOTE_SNAPSHOT_FIELDS = ("id", "title", "body", "author_id", "is_deleted", "created_at", "updated_at")
+
+
+def note_snapshot_size(snapshot: dict[str, Any]) -> int:
+    return sys.getsizeof(snapshot) + sum(sys.getsizeof(value) for value in snapshot.values())
+
+
 class NotesRepository(SQLAlchemyAsyncRepository[models.Note]):
     model_type = models.Note
 
+    async def update_returning(self, *filters, values: dict[str, Any]) -> models.Note | None:
+        """Update at most one note matching ``filters`` in a single ``UPDATE ... RETURNING`` statement."""
+        statement = sa.update(models.Note).where(*filters).values(**values).returning(models.Note)
+        return (await self.session.scalars(statement)).one_or_none()
+
+    async def insert_many_returning(self, values: list[dict[str, Any]]) -> Sequence[models.Note]:
+        """Insert all ``values`` in a single multi-row ``INSERT ... RETURNING``, keeping their order."""
+        statement = sa.insert(models.Note).returning(models.Note, sort_by_parameter_order=True)
+        return (await self.session.scalars(statement, values)).all()
+
+    async def update_many_returning(self, *filters, values: list[dict[str, Any]]) -> Sequence[models.Note]:
+        """Apply per-note ``values`` keyed by ``id`` in a single ``UPDATE ... FROM (VALUES ...) RETURNING``."""
+        names = list(values[0])
+        rows = sa.values(*(sa.column(name, models.Note.__table__.c[name].type) for name in names), name="data").data(
+            [tuple(item[name] for name in names) for item in values]
+        )
+        statement = (
+            sa.update(models.Note)
+            .where(models.Note.id == rows.c.id, *filters)
+            .values({name: rows.c[name] for name in names if name != "id"})
+            .returning(models.Note)
+        )
+        return (await self.session.scalars(statement)).all()
+
+    async def update_all_returning(self, *filters, values: dict[str, Any]) -> Sequence[models.Note]:
+        """Update every note matching ``filters`` with the same ``values`` in a single statement."""
+        statement = sa.update(models.Note).where(*filters).values(**values).returning(models.Note)
+        return (await self.session.scalars(statement)).all()
+
+    async def search(
+        self, *filters, query: str, limit: int, after: tuple[float, int] | None = None
+    ) -> list[tuple[models.Note, float]]:
+        """Find notes matching a web-search style ``query``, best matches first."""
+        ts_query = sa.func.websearch_to_tsquery(NotesConstraints.search_config, query)
+        rank = sa.func.ts_rank(models.Note.search_vector, ts_query).label("rank")
+        statement = sa.select(models.Note, rank).where(models.Note.search_vector.bool_op("@@")(ts_query), *filters)
+        if after is not None:
+            statement = statement.where(sa.tuple_(rank, models.Note.id) < after)
+        statement = statement.order_by(rank.desc(), models.Note.id.desc()).limit(limit)
+        return [(note, rank) for note, rank in await self.session.execute(statement)]
+
+    def summary_statement(self, preview_length: int | None = None) -> sa.Select[tuple[models.Note]]:
+        """Select notes without their body, optionally with its first ``preview_length`` characters."""
+        preview = sa.func.left(models.Note.body, preview_length) if preview_length is not None else sa.null()
+        return sa.select(models.Note).options(
+            orm.load_only(
+                models.Note.id,
+                models.Note.title,
+                models.Note.author_id,
+                models.Note.is_deleted,
+                models.Note.created_at,
+                models.Note.updated_at,
+                raiseload=True,
+            ),
+            orm.with_expression(models.Note.body_preview, preview),
+        )
+
+    async def stream_rows(self, *filters, chunk_size: int) -> AsyncIterator[Sequence[sa.RowMapping]]:
+        """Yield plain rows of notes matching ``filters`` in chunks read from a server-side cursor."""
+        columns = [models.Note.__table__.c[name] for name in NOTE_SNAPSHOT_FIELDS]
+        statement = sa.select(*columns).where(*filters).order_by(models.Note.id)
+        result = await self.session.stream(statement.execution_options(yield_per=chunk_size))
+        async for rows in result.mappings().partitions():
+            yield rows
+
+    async def get_author_id(self, item_id: int, *filters) -> int | None:
+        return await self.session.scalar(sa.select(models.Note.author_id).where(models.Note.id == item_id, *filters))
+
+    async def get_version(self, item_id: int, *filters) -> tuple[int, dt.datetime] | None:
+        """Fetch only the author and ``updated_at`` of a note, enough to check access and build its ETag."""
+        statement = sa.select(models.Note.author_id, models.Note.updated_at).where(models.Note.id == item_id, *filters)
+        return (await self.session.execute(statement)).tuples().one_or_none()
+
+    async def get_last_modified(self, author_id: int) -> dt.datetime | None:
+        """Find the latest change among the author's notes, deleted ones included, from an index alone."""
+        statement = sa.select(sa.func.max(models.Note.updated_at)).where(models.Note.author_id == author_id)
+        return await self.session.scalar(statement)
+
+    async def estimate_count(self, *filters) -> int:
+        """Estimate how many notes match ``filters`` from the planner's statistics, without reading them."""
+        statement = self._apply_filters(*filters, apply_pagination=False, statement=sa.select(models.Note.id))
+        compiled = statement.compile(self.session.get_bind())
+        parameters = tuple(compiled.params[name] for name in compiled.positiontup or ())
+        connection = await self.session.connection()
+        plan = (await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", parameters)).scalar_one()
+        return int(plan[0]["Plan"]["Plan Rows"])
+
+    async def get_author_ids(self, item_ids: Sequence[int], *filters) -> dict[int, int]:
+        statement = sa.select(models.Note.id, models.Note.author_id).where(models.Note.id.in_(item_ids), *filters)
+        return dict((await self.session.execute(statement)).tuples().all())
+
 
 class NotesService(SQLAlchemyAsyncRepositoryService[models.Note]):
     not_deleted_filter = not_(models.Note.is_deleted)
     repository_type = NotesRepository
 
-    @staticmethod
-    def _check_is_owner(note: models.Note, user: models.User) -> None:
-        if note.author_id != user.id:
-            raise AccessDeniedError
+    def __init__(
+        self,
+        *args,
+        cache: Cache[int, dict[str, Any]] | None = None,
+        notifier: ChangeNotifier | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.notifier = notifier
+
+    async def _commit_changes(self, item_ids: Sequence[int], auto_commit: bool | None) -> None:
+        # NOTIFY must be part of the transaction that changes the notes, while the local copies are dropped
+        # only once it has committed, so that a concurrent read is unlikely to cache the old version again
+        if self.notifier is not None and item_ids:
+            await self.notifier.notify(self.repository.session, ChangeKind.note, item_ids)
+        if self.repository.auto_commit if auto_commit is None else auto_commit:
+            await self.repository.session.commit()
+        if self.cache is not None:
+            for item_id in item_ids:
+                self.cache.pop(item_id)
 
     @staticmethod
-    def _check_is_admin_or_owner(note: models.Note, user: models.User) -> None:
-        if not user.is_admin and note.author_id != user.id:
+    def _check_is_admin_or_owner(author_id: int, user: schemas.Principal) -> None:
+        if not user.is_admin and author_id != user.id:
             raise AccessDeniedError
 
-    async def create_with_author(self, data: "ModelDictT[models.Note]", author: models.User, **kwargs) -> models.Note:
+    async def create_with_author(
+        self, data: "ModelDictT[models.Note]", author: schemas.Principal, auto_commit: bool | None = None, **kwargs
+    ) -> models.Note:
         data = await self.to_model(data, "update")
         data.author_id = author.id
-        return await super().create(data=data, **kwargs)
+        instance = await super().create(data=data, auto_commit=False, **kwargs)
+        await self._commit_changes([instance.id], auto_commit)
+        return instance
+
+    async def _raise_not_updated(self, item_id: int, user: schemas.Principal, conditional: bool = False) -> NoReturn:
+        # only reached when the owner's update matched no rows, so the extra probe stays off the success path
+        author_id = await self.repository.get_author_id(item_id, self.not_deleted_filter)
+        if author_id is not None and author_id != user.id:
+            raise AccessDeniedError
+        if author_id is not None and conditional:
+            raise PreconditionFailedError
+        msg = "No item found when one was expected"
+        raise NotFoundError(msg)
 
-    async def soft_delete(self, item_id: int, user: models.User, **kwargs) -> models.Note:
-        instance = await self.get_one(models.Note.id == item_id, self.not_deleted_filter)
-        self._check_is_owner(instance, user)
-        instance.is_deleted = True
-        return await super().update(data=instance, item_id=item_id, **kwargs)
+    async def _not_updated_errors(self, item_ids: Sequence[int], user: schemas.Principal) -> dict[int, Exception]:
+        # bulk counterpart of ``_raise_not_updated``: one probe for every item the owner's update skipped
+        if not item_ids:
+            return {}
+        author_ids = await self.repository.get_author_ids(item_ids, self.not_deleted_filter)
+        msg = "No item found when one was expected"
+        return {
+            item_id: AccessDeniedError() if author_ids.get(item_id, user.id) != user.id else NotFoundError(msg)
+            for item_id in item_ids
+        }
+
+    async def soft_delete(self, item_id: int, user: schemas.Principal, auto_commit: bool | None = None) -> models.Note:
+        instance = await self.repository.update_returning(
+            models.Note.id == item_id,
+            models.Note.author_id == user.id,
+            self.not_deleted_filter,
+            values={"is_deleted": True},
+        )
+        if instance is None:
+            await self._raise_not_updated(item_id, user)
+        await self._commit_changes([instance.id], auto_commit)
+        return instance
 
     async def update_with_access_check(
         self,
-        data: "ModelDictT[models.Note]",
+        data: dict[str, Any],
         item_id: int,
-        user: models.User,
-        **kwargs,
+        user: schemas.Principal,
+        auto_commit: bool | None = None,
+        expected_versions: Sequence[dt.datetime] | None = None,
     ) -> models.Note:
-        instance = await self.get_one(models.Note.id == item_id, self.not_deleted_filter)
-        self._check_is_owner(instance, user)
-        return await super().update(data=data, item_id=item_id, **kwargs)
+        """Update the caller's note, optionally only if its ``updated_at`` is one of ``expected_versions``."""
+        filters = [models.Note.id == item_id, models.Note.author_id == user.id, self.not_deleted_filter]
+        if expected_versions is not None:
+            filters.append(models.Note.updated_at.in_(expected_versions))
+        instance = await self.repository.update_returning(*filters, values=data)
+        if instance is None:
+            await self._raise_not_updated(item_id, user, conditional=expected_versions is not None)
+        await self._commit_changes([instance.id], auto_commit)
+        return instance
+
+    async def bulk_create_with_author(
+        self, data: list[dict[str, Any]], author: schemas.Principal, auto_commit: bool | None = None
+    ) -> Sequence[models.Note]:
+        instances = await self.repository.insert_many_returning([{**item, "author_id": author.id} for item in data])
+        await self._commit_changes([instance.id for instance in instances], auto_commit)
+        return instances
+
+    async def bulk_update_with_access_check(
+        self, data: list[dict[str, Any]], user: schemas.Principal, auto_commit: bool | None = None
+    ) -> dict[int, models.Note | Exception]:
+        """Update the caller's notes, returning either the updated note or the error for every requested id."""
+        instances = await self.repository.update_many_returning(
+            models.Note.author_id == user.id, self.not_deleted_filter, values=data
+        )
+        await self._commit_changes([instance.id for instance in instances], auto_commit)
+        return await self._bulk_outcomes([item["id"] for item in data], instances, user)
+
+    async def bulk_soft_delete(
+        self, item_ids: list[int], user: schemas.Principal, auto_commit: bool | None = None
+    ) -> dict[int, models.Note | Exception]:
+        """Soft-delete the caller's notes, returning either the deleted note or the error for every requested id."""
+        instances = await self.repository.update_all_returning(
+            models.Note.id.in_(item_ids),
+            models.Note.author_id == user.id,
+            self.not_deleted_filter,
+            values={"is_deleted": True},
+        )
+        await self._commit_changes([instance.id for instance in instances], auto_commit)
+        return await self._bulk_outcomes(item_ids, instances, user)
 
-    async def get_one_with_access_check(self, *filters, user: models.User) -> models.Note:
-        instance = await self.get_one(*filters, self.not_deleted_filter)
-        self._check_is_admin_or_owner(instance, user)
+    async def _bulk_outcomes(
+        self, item_ids: list[int], instances: Sequence[models.Note], user: schemas.Principal
+    ) -> dict[int, models.Note | Exception]:
+        updated = {instance.id: instance for instance in instances}
+        errors = await self._not_updated_errors([item_id for item_id in item_ids if item_id not in updated], user)
+        return {item_id: updated.get(item_id) or errors[item_id] for item_id in item_ids}
+
+    async def get_one_with_access_check(self, item_id: int, user: schemas.Principal) -> models.Note:
+        """Read a note through the cache, which holds detached column snapshots rather than session-bound rows."""
+        snapshot = self.cache.get(item_id) if self.cache is not None else None
+        if snapshot is not None:
+            instance = models.Note(**snapshot)
+        else:
+            # a change committed while the row is read drops nothing yet, so the cache must not take the old row
+            generation = self.cache.generation if self.cache is not None else 0
+            instance = await self.get_one(models.Note.id == item_id, self.not_deleted_filter)
+            if self.cache is not None:
+                snapshot = {name: getattr(instance, name) for name in NOTE_SNAPSHOT_FIELDS}
+                self.cache.set(item_id, snapshot, generation=generation)
+        self._check_is_admin_or_owner(instance.author_id, user)
         return instance
 
-    async def restore(self, item_id: int, **kwargs) -> models.Note:
-        instance = await self.get_one(models.Note.id == item_id, models.Note.is_deleted == true())
-        instance.is_deleted = False
-        return await super().update(data=instance, item_id=item_id, **kwargs)
+    async def get_version_with_access_check(self, item_id: int, user: schemas.Principal) -> dt.datetime:
+        snapshot = self.cache.get(item_id) if self.cache is not None else None
+        version = (
+            (snapshot["author_id"], snapshot["updated_at"])
+            if snapshot is not None
+            else await self.repository.get_version(item_id, self.not_deleted_filter)
+        )
+        if version is None:
+            msg = "No item found when one was expected"
+            raise NotFoundError(msg)
+        author_id, updated_at = version
+        self._check_is_admin_or_owner(author_id, user)
+        return updated_at
+
+    async def get_last_modified(self, author_id: int) -> dt.datetime | None:
+        return await self.repository.get_last_modified(author_id)
+
+    async def estimate_count(self, *filters) -> int:
+        return await self.repository.estimate_count(*filters)
+
+    async def list_after_cursor(
+        self, *filters, cursor: str | None, limit: int, statement: sa.Select[tuple[models.Note]] | None = None
+    ) -> tuple[Sequence[models.Note], str | None]:
+        after = decode_cursor(cursor) if cursor is not None else None
+        results = await self.list(*filters, KeysetPagination(limit=limit + 1, after=after), statement=statement)
+        if len(results) <= limit:
+            return results, None
+        results = results[:limit]
+        return results, encode_cursor(results[-1].created_at, results[-1].id)
+
+    async def search(
+        self, *filters, query: str, cursor: str | None, limit: int
+    ) -> tuple[list[models.Note], str | None]:
+        after = decode_rank_cursor(cursor) if cursor is not None else None
+        results = await self.repository.search(*filters, query=query, limit=limit + 1, after=after)
+        notes = [note for note, _ in results[:limit]]
+        if len(results) <= limit:
+            return notes, None
+        _, last_rank = results[limit - 1]
+        return notes, encode_rank_cursor(last_rank, notes[-1].id)
+
+    async def restore(self, item_id: int, auto_commit: bool | None = None) -> models.Note:
+        instance = await self.repository.update_returning(
+            models.Note.id == item_id,
+            models.Note.is_deleted == true(),
+            values={"is_deleted": False},
+        )
+        if instance is None:
+            msg = "No item found when one was expected"
+            raise NotFoundError(msg)
+        await self._commit_changes([instance.id], auto_commit)
+        return instance
 
 
 class UsersRepository(SQLAlchemyAsyncRepository[models.User]):
@@ -70,3 +328,47 @@ class UsersRepository(SQLAlchemyAsyncRepository[models.User]):
 
 class UsersService(SQLAlchemyAsyncRepositoryService[models.User]):
     repository_type = UsersRepository
+
+    def __init__(
+        self,
+        *args,
+        principals_cache: TTLCache[str, schemas.Principal] | None = None,
+        token_revocations: TokenRevocations | None = None,
+        notifier: ChangeNotifier | None = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.principals_cache = principals_cache
+        self.token_revocations = token_revocations
+        self.notifier = notifier
+
+    def invalidate_principal(self, user_id: int) -> None:
+        if self.principals_cache is not None:
+            self.principals_cache.discard_where(lambda principal: principal.id == user_id)
+        if self.token_revocations is not None:
+            # tokens issued up to this moment can no longer be trusted by their claims alone
+            self.token_revocations.revoke(user_id, time.time())
+
+    async def _commit_changes(self, user_id: int, auto_commit: bool | None) -> None:
+        # see ``NotesService._commit_changes``
+        if self.notifier is not None:
+            await self.notifier.notify(self.repository.session, ChangeKind.user, [user_id])
+        if self.repository.auto_commit if auto_commit is None else auto_commit:
+            await self.repository.session.commit()
+        self.invalidate_principal(user_id)
+
+    async def update(
+        self,
+        data: "ModelDictT[models.User]",
+        item_id: int | None = None,
+        auto_commit: bool | None = None,
+        **kwargs,
+    ) -> models.User:
+        instance = await super().update(data=data, item_id=item_id, auto_commit=False, **kwargs)
+        await self._commit_changes(instance.id, auto_commit)
+        return instance
+
+    async def delete(self, item_id: int, auto_commit: bool | None = None, **kwargs) -> models.User:
+        instance = await super().delete(item_id=item_id, auto_commit=False, **kwargs)
+        await self._commit_changes(instance.id, auto_commit)
+        return instance
@@ -1,21 +1,38 @@
+import time
 import typing
 
 from loguru import logger
 from sqlalchemy.ext import asyncio as sa
+from sqlalchemy.pool import AsyncAdaptedQueuePool, ConnectionPoolEntry
 
+from app.metrics import DB_POOL_WAIT_SECONDS
+from app.query_stats import track_queries
 from app.settings import settings
 
 
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Default asyncio pool that records how long every checkout waits for a connection."""
+
+    def _do_get(self) -> ConnectionPoolEntry:
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_WAIT_SECONDS.observe(time.perf_counter() - started_at)
+
+
 async def create_sa_engine() -> typing.AsyncIterator[sa.AsyncEngine]:
     logger.info("Initializing SQLAlchemy engine")
     engine = sa.create_async_engine(
         url=settings.db_dsn_parsed,
         echo=settings.service_debug,
         echo_pool=settings.service_debug,
-        pool_size=settings.db_pool_size,
+        pool_size=settings.db_worker_pool_size,
         pool_pre_ping=settings.db_pool_pre_ping,
-        max_overflow=settings.db_max_overflow,
+        max_overflow=settings.db_worker_max_overflow,
+        poolclass=TimedQueuePool,
     )
+    track_queries(engine)
     logger.info("SQLAlchemy engine has been initialized")
     try:
         yield engine
@@ -32,8 +49,12 @@ class CustomAsyncSession(sa.AsyncSession):
         return await super().close()
 
 
+def open_session(engine: sa.AsyncEngine) -> sa.AsyncSession:
+    return CustomAsyncSession(engine, expire_on_commit=False, autoflush=False)
+
+
 async def create_session(engine: sa.AsyncEngine) -> typing.AsyncIterator[sa.AsyncSession]:
-    async with CustomAsyncSession(engine, expire_on_commit=False, autoflush=False) as session:
+    async with open_session(engine) as session:
         logger.info("session created")
         yield session
         logger.info("session closed")
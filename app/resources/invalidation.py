@@ -0,0 +1,47 @@
+import time
+import typing
+
+from loguru import logger
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app import schemas
+from app.cache import TokenRevocations, TTLCache
+from app.invalidation import ChangeKind, ChangeListener
+from app.settings import settings
+
+
+async def create_change_listener(
+    engine: AsyncEngine,
+    notes_cache: TTLCache[int, dict[str, typing.Any]],
+    principals_cache: TTLCache[str, schemas.Principal],
+    token_revocations: TokenRevocations,
+) -> typing.AsyncIterator[ChangeListener]:
+    def forget_notes(ids: list[int], _: float) -> None:
+        for note_id in ids:
+            notes_cache.pop(note_id)
+
+    def forget_users(ids: list[int], changed_at: float) -> None:
+        principals_cache.discard_where(lambda principal: principal.id in ids)
+        for user_id in ids:
+            token_revocations.revoke(user_id, changed_at)
+
+    def reset() -> None:
+        notes_cache.clear()
+        principals_cache.clear()
+        # revocations may have been missed as well, so tokens issued so far fall back to the users lookup
+        token_revocations.distrust_until(time.time())
+
+    logger.info("Starting change listener")
+    listener = ChangeListener(
+        engine,
+        channel=settings.cache_invalidation_channel,
+        handlers={ChangeKind.note: forget_notes, ChangeKind.user: forget_users},
+        on_reset=reset,
+        reconnect_delay=settings.cache_invalidation_reconnect_delay_seconds,
+    )
+    listener.start()
+    try:
+        yield listener
+    finally:
+        await listener.stop()
+        logger.info("Change listener has been stopped")
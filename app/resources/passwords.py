@@ -0,0 +1,16 @@
+import typing
+
+from loguru import logger
+
+from app.passwords import PasswordHasher
+from app.settings import settings
+
+
+async def create_password_hasher() -> typing.AsyncIterator[PasswordHasher]:
+    logger.info("Initializing password hasher pool")
+    hasher = PasswordHasher(max_workers=settings.password_hasher_workers, max_queue=settings.password_hasher_max_queue)
+    try:
+        yield hasher
+    finally:
+        hasher.shutdown()
+        logger.info("Password hasher pool has been shut down")
@@ -0,0 +1,30 @@
+import typing
+
+import orjson
+import pydantic_core
+from fastapi import responses
+
+
+NDJSON_MEDIA_TYPE: typing.Final = "application/x-ndjson"
+
+
+class ORJSONResponse(responses.ORJSONResponse):
+    """JSON response encoded by orjson, which also accepts pydantic models and dataclasses as content.
+
+    Handlers whose payload is already made of validated schemas return it wrapped in this response,
+    so FastAPI does not validate it against ``response_model`` once more before encoding it.
+    """
+
+    def render(self, content: typing.Any) -> bytes:  # noqa: ANN401
+        return orjson.dumps(content, default=pydantic_core.to_jsonable_python, option=orjson.OPT_NON_STR_KEYS)
+
+
+class NDJSONStreamingResponse(responses.StreamingResponse):
+    """Newline-delimited JSON sent chunk by chunk, see ``ndjson_lines``."""
+
+    media_type = NDJSON_MEDIA_TYPE
+
+
+def ndjson_lines(rows: typing.Iterable[typing.Any]) -> bytes:
+    # OPT_UTC_Z keeps datetimes in the same format as the pydantic-rendered responses
+    return b"".join(orjson.dumps(row, option=orjson.OPT_UTC_Z | orjson.OPT_APPEND_NEWLINE) for row in rows)
@@ -1,10 +1,38 @@
-from app.schemas.auth import Token
-from app.schemas.notes import Note, NoteAdmin, NoteCreate
+from app.schemas.auth import Principal, Token
+from app.schemas.notes import (
+    Note,
+    NoteAdmin,
+    NoteAdminSummary,
+    NoteBulkCreate,
+    NoteBulkDelete,
+    NoteBulkResult,
+    NoteBulkResults,
+    NoteBulkUpdate,
+    NoteBulkUpdateItem,
+    NoteCreate,
+    NoteImportError,
+    NoteImportResult,
+    NoteSummary,
+)
+from app.schemas.pagination import CursorPagination, OffsetPagination
 
 
 __all__ = [
+    "CursorPagination",
     "Note",
     "NoteAdmin",
+    "NoteAdminSummary",
+    "NoteBulkCreate",
+    "NoteBulkDelete",
+    "NoteBulkResult",
+    "NoteBulkResults",
+    "NoteBulkUpdate",
+    "NoteBulkUpdateItem",
     "NoteCreate",
+    "NoteImportError",
+    "NoteImportResult",
+    "NoteSummary",
+    "OffsetPagination",
+    "Principal",
     "Token",
 ]
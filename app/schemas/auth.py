@@ -1,3 +1,4 @@
+import pydantic
 from pydantic import BaseModel
 
 
@@ -8,3 +9,18 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str | None = None
+    user_id: int | None = None
+    role: str | None = None
+    issued_at: int | None = None
+
+
+class Principal(BaseModel):
+    model_config = pydantic.ConfigDict(from_attributes=True, frozen=True)
+
+    id: int
+    login: str
+    is_admin: bool
+
+    @property
+    def verbose_role(self) -> str:
+        return "admin" if self.is_admin else "user"
@@ -1,7 +1,8 @@
+import datetime as dt
 from typing import Annotated
 
 import pydantic
-from pydantic import BaseModel, PositiveInt, StringConstraints
+from pydantic import BaseModel, Field, PositiveInt, StringConstraints
 
 from app.constraints import NotesConstraints as Constraints
 
@@ -26,3 +27,75 @@ class Note(NoteBase):
 
 class NoteAdmin(Note):
     is_deleted: bool
+
+
+class NoteSummary(Base):
+    id: PositiveInt
+    title: str
+    author_id: PositiveInt
+    created_at: dt.datetime
+    updated_at: dt.datetime
+    body_preview: str | None = None
+
+
+class NoteAdminSummary(NoteSummary):
+    is_deleted: bool
+
+
+type BulkItems[T] = Annotated[list[T], Field(min_length=1, max_length=Constraints.max_bulk_items)]
+
+
+def _check_unique_ids(ids: list[int]) -> None:
+    if len(set(ids)) != len(ids):
+        msg = "note ids must be unique"
+        raise ValueError(msg)
+
+
+class NoteBulkCreate(Base):
+    items: BulkItems[NoteCreate]
+
+
+class NoteBulkUpdateItem(NoteCreate):
+    id: PositiveInt
+
+
+class NoteBulkUpdate(Base):
+    items: BulkItems[NoteBulkUpdateItem]
+
+    @pydantic.field_validator("items")
+    @classmethod
+    def check_unique_ids(cls, items: list[NoteBulkUpdateItem]) -> list[NoteBulkUpdateItem]:
+        _check_unique_ids([item.id for item in items])
+        return items
+
+
+class NoteBulkDelete(Base):
+    ids: BulkItems[PositiveInt]
+
+    @pydantic.field_validator("ids")
+    @classmethod
+    def check_unique_ids(cls, ids: list[int]) -> list[int]:
+        _check_unique_ids(ids)
+        return ids
+
+
+class NoteBulkResult(Base):
+    id: PositiveInt
+    status: int
+    detail: str | None = None
+    note: Note | None = None
+
+
+class NoteBulkResults(Base):
+    items: list[NoteBulkResult]
+
+
+class NoteImportError(Base):
+    line: PositiveInt
+    detail: str
+
+
+class NoteImportResult(Base):
+    created: int
+    failed: int
+    errors: list[NoteImportError]
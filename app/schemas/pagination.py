@@ -0,0 +1,16 @@
+from collections.abc import Sequence
+
+from pydantic import BaseModel
+
+
+class OffsetPagination[T](BaseModel):
+    items: Sequence[T]
+    limit: int
+    offset: int
+    total: int | None
+
+
+class CursorPagination[T](BaseModel):
+    items: Sequence[T]
+    limit: int
+    next_cursor: str | None
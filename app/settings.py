@@ -1,7 +1,13 @@
+import typing
+
+import pydantic
 import pydantic_settings
+from granian.constants import HTTPModes
 from lite_bootstrap import FastAPIConfig
 from sqlalchemy.engine.url import URL, make_url
 
+from app.action_log import QueueFullPolicy
+
 
 class Settings(pydantic_settings.BaseSettings):
     service_name: str = "Notes API"
@@ -14,11 +20,35 @@ class Settings(pydantic_settings.BaseSettings):
     db_pool_size: int = 5
     db_max_overflow: int = 0
     db_pool_pre_ping: bool = True
+    # connections all workers of one instance may hold together, change listeners included, 0 disables the budget;
+    # the default leaves room under Postgres' default max_connections of 100 for other clients and replicas
+    db_max_connections: int = 50
 
     app_host: str = "0.0.0.0"  # noqa: S104
     app_port: int = 8000
+    # Granian server settings; one worker per instance is the supported setup, scale out with replicas
+    # as metrics are kept per process, see app/metrics.py
+    app_workers: int = pydantic.Field(default=1, ge=1)
+    app_runtime_threads: int = 1
+    app_backlog: int = 1024
+    app_backpressure: int | None = None  # concurrent requests per worker, defaults to backlog / workers
+    app_http: HTTPModes = HTTPModes.auto
+    app_http1_keep_alive: bool = True
+    app_http2_max_concurrent_streams: int = 200
 
     opentelemetry_endpoint: str = ""
+    # share of traces recorded and exported from the start, optionally overridden per route template
+    tracing_head_sample_ratio: float = pydantic.Field(default=1.0, ge=0, le=1)
+    tracing_route_sample_ratios: dict[str, typing.Annotated[float, pydantic.Field(ge=0, le=1)]] = {}
+    # another share that is recorded, but only exported when the request fails or is slower than the threshold
+    tracing_tail_sample_ratio: float = pydantic.Field(default=0, ge=0, le=1)
+    tracing_tail_latency_threshold: float = 1.0  # seconds
+    tracing_tail_max_pending_traces: int = 1000
+    # query parameters are truncated, and not captured at all for statements touching the redacted columns
+    tracing_capture_parameters: bool = True
+    tracing_parameter_max_length: int = 64
+    tracing_parameters_max_items: int = 16
+    tracing_redacted_columns: list[str] = ["password"]
     sentry_dsn: str = ""
     logging_buffer_capacity: int = 0
     swagger_offline_docs: bool = True
@@ -28,12 +58,85 @@ class Settings(pydantic_settings.BaseSettings):
     cors_allowed_headers: list[str] = [""]
     cors_exposed_headers: list[str] = []
 
-    actions_log_file: str = "actions.log"
+    actions_log_file: str = "actions.log"  # with several workers each one writes to e.g. actions.<pid>.log
+    actions_log_queue_size: int = 10000
+    actions_log_batch_size: int = 512
+    actions_log_queue_full_policy: QueueFullPolicy = QueueFullPolicy.drop
+    actions_log_rotation_size: int = 0  # bytes, 0 disables size-based rotation
+    actions_log_rotation_interval: float = 0  # seconds, 0 disables time-based rotation
 
     # JWT token settings
     jwt_algorithm: str = "HS256"
     jwt_token_expire_minutes: int = 30
     jwt_secret_key: str = ""  # change me!
+    # when enabled, principals are built from verified token claims without a users lookup
+    jwt_trust_claims: bool = False
+    jwt_trusted_token_expire_minutes: int = 5
+    # once full, tokens issued before the oldest dropped revocation fall back to the users lookup
+    jwt_revocations_max_size: int = 10000
+
+    # password hashing settings
+    password_hasher_workers: int = 2
+    # operations waiting for a worker beyond this are answered with 503
+    password_hasher_max_queue: int = 32
+
+    # authenticated principals cache settings
+    auth_cache_max_size: int = 1024
+    auth_cache_ttl_seconds: float = 60
+
+    # notes read-through cache settings
+    notes_cache_max_size: int = 10000
+    notes_cache_max_bytes: int = 64 * 1024 * 1024
+    notes_cache_ttl_seconds: float = 30
+
+    # notes export settings
+    notes_export_chunk_size: int = 1000  # rows fetched from the server-side cursor at a time
+
+    # notes import settings
+    notes_import_batch_size: int = 500  # notes inserted by one statement
+    notes_import_max_line_size: int = 1024 * 1024  # bytes, longer lines are reported and skipped
+    notes_import_max_reported_errors: int = 1000  # further failed lines are only counted
+
+    # metrics settings
+    metrics_latency_buckets: list[float] = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10]
+
+    # per-request profiling, triggered by admins with the X-Profile header or the profile query flag
+    profiling_enabled: bool = False
+    profiling_interval: float = 0.001  # seconds between stack samples
+    profiling_output_dir: str = ""  # profiles are returned instead of the response unless set
+
+    # HTTP compression settings
+    compression_minimum_size: int = 1024  # bytes, smaller responses are sent uncompressed
+    compression_level: int = pydantic.Field(default=4, ge=0, le=9)  # the same level for gzip, brotli and zstd
+    request_max_decompressed_size: int = 64 * 1024 * 1024
+
+    # cross-process cache invalidation settings
+    cache_invalidation_channel: str = "cache_invalidation"
+    cache_invalidation_reconnect_delay_seconds: float = 1
+
+    @pydantic.model_validator(mode="after")
+    def check_db_connections_budget(self) -> typing.Self:
+        # every worker needs one connection for the change listener and at least one for requests
+        if self.db_max_connections and self.db_max_connections < 2 * self.app_workers:
+            msg = f"db_max_connections must allow at least 2 connections for each of {self.app_workers} workers"
+            raise ValueError(msg)
+        return self
+
+    @property
+    def db_worker_pool_size(self) -> int:
+        if not self.db_max_connections:
+            return self.db_pool_size
+        return min(self.db_pool_size, self.db_max_connections // self.app_workers)
+
+    @property
+    def db_worker_max_overflow(self) -> int:
+        if not self.db_max_connections:
+            return self.db_max_overflow
+        return min(self.db_max_overflow, self.db_max_connections // self.app_workers - self.db_worker_pool_size)
+
+    @property
+    def jwt_max_token_lifetime_seconds(self) -> int:
+        return max(self.jwt_token_expire_minutes, self.jwt_trusted_token_expire_minutes) * 60
 
     @property
     def db_dsn_parsed(self) -> URL:
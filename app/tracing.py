@@ -0,0 +1,230 @@
+import re
+import reprlib
+import typing
+from collections.abc import Awaitable, Callable, Collection, Sequence
+
+import asyncpg
+from opentelemetry import trace
+from opentelemetry.context import Context
+from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+from opentelemetry.instrumentation.asyncpg import AsyncPGInstrumentor
+from opentelemetry.instrumentation.instrumentor import BaseInstrumentor  # type: ignore[attr-defined]
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter
+from opentelemetry.sdk.trace.sampling import Decision, Sampler, SamplingResult, TraceIdRatioBased
+from opentelemetry.semconv.attributes.http_attributes import HTTP_ROUTE
+from opentelemetry.trace import Link, SpanContext, SpanKind, StatusCode, TraceFlags, TraceState
+from opentelemetry.util.types import Attributes
+
+
+if typing.TYPE_CHECKING:
+    from asyncpg.cursor import BaseCursor
+
+
+PARAMETERS_ATTRIBUTE: typing.Final = "db.statement.parameters"
+REDACTED: typing.Final = "[REDACTED]"
+
+type Query = Callable[..., Awaitable[typing.Any]]
+
+
+class RouteRatioSampler(Sampler):
+    """Head sampler that decides once per trace, by the route of the request that started it.
+
+    ``head_ratio`` of traces are recorded and exported; another ``tail_ratio`` are only recorded,
+    so that ``TailSamplingSpanProcessor`` can export them after the fact if they turn out slow or failed.
+    Spans of a trace follow the decision made for its root.
+    """
+
+    def __init__(self, head_ratio: float, tail_ratio: float, route_ratios: dict[str, float]) -> None:
+        self.head_bound = TraceIdRatioBased.get_bound_for_rate(head_ratio)
+        self.tail_ratio = tail_ratio
+        self.route_bounds = {
+            route: TraceIdRatioBased.get_bound_for_rate(ratio) for route, ratio in route_ratios.items()
+        }
+
+    def should_sample(  # noqa: PLR0913
+        self,
+        parent_context: Context | None,
+        trace_id: int,
+        name: str,  # noqa: ARG002
+        kind: SpanKind | None = None,  # noqa: ARG002
+        attributes: Attributes = None,
+        links: Sequence[Link] | None = None,  # noqa: ARG002
+        trace_state: TraceState | None = None,  # noqa: ARG002
+    ) -> SamplingResult:
+        parent = trace.get_current_span(parent_context)
+        parent_span_context = parent.get_span_context()
+        if parent_span_context.is_valid:
+            if parent_span_context.trace_flags.sampled:
+                decision = Decision.RECORD_AND_SAMPLE
+            elif parent.is_recording():
+                decision = Decision.RECORD_ONLY
+            else:
+                decision = Decision.DROP
+            return SamplingResult(decision, attributes, parent_span_context.trace_state)
+
+        route = (attributes or {}).get(HTTP_ROUTE)
+        head_bound = self.route_bounds.get(str(route), self.head_bound)
+        tail_bound = min(
+            head_bound + TraceIdRatioBased.get_bound_for_rate(self.tail_ratio), TraceIdRatioBased.TRACE_ID_LIMIT + 1
+        )
+        sample = trace_id & TraceIdRatioBased.TRACE_ID_LIMIT
+        if sample < head_bound:
+            return SamplingResult(Decision.RECORD_AND_SAMPLE, attributes)
+        if sample < tail_bound:
+            return SamplingResult(Decision.RECORD_ONLY, attributes)
+        return SamplingResult(Decision.DROP)
+
+    def get_description(self) -> str:
+        return f"RouteRatioSampler{{head={self.head_bound}, tail={self.tail_ratio}, routes={self.route_bounds}}}"
+
+
+class TailSamplingSpanProcessor(BatchSpanProcessor):
+    """Exports traces that were only recorded by the head sampler if they failed or were slow.
+
+    Spans are held in memory until the local root of their trace ends; at most ``max_pending_traces``
+    traces are held at once, spans of newer ones are dropped until some finish.
+    """
+
+    def __init__(self, span_exporter: SpanExporter, latency_threshold: float, max_pending_traces: int) -> None:
+        super().__init__(span_exporter)
+        self.latency_threshold_ns = int(latency_threshold * 1e9)
+        self.max_pending_traces = max_pending_traces
+        self._pending: dict[int, list[ReadableSpan]] = {}
+
+    def on_end(self, span: ReadableSpan) -> None:
+        context = span.get_span_context()
+        if context is None or context.trace_flags.sampled:
+            # sampled spans are exported by the regular processor
+            return
+
+        spans = self._pending.get(context.trace_id)
+        if spans is None:
+            if len(self._pending) >= self.max_pending_traces:
+                return
+            spans = self._pending[context.trace_id] = []
+        spans.append(span)
+        if span.parent is not None and not span.parent.is_remote:
+            return
+
+        del self._pending[context.trace_id]
+        if self._should_keep(span, spans):
+            for one_span in spans:
+                super().on_end(_as_sampled(one_span))
+
+    def _should_keep(self, root: ReadableSpan, spans: list[ReadableSpan]) -> bool:
+        duration = (root.end_time or 0) - (root.start_time or 0)
+        return duration >= self.latency_threshold_ns or any(
+            one_span.status.status_code is StatusCode.ERROR for one_span in spans
+        )
+
+
+def _as_sampled(span: ReadableSpan) -> ReadableSpan:
+    context = typing.cast("SpanContext", span.get_span_context())
+    return ReadableSpan(
+        name=span.name,
+        context=SpanContext(
+            trace_id=context.trace_id,
+            span_id=context.span_id,
+            is_remote=context.is_remote,
+            trace_flags=TraceFlags(context.trace_flags | TraceFlags.SAMPLED),
+            trace_state=context.trace_state,
+        ),
+        parent=span.parent,
+        resource=span.resource,
+        attributes=span.attributes,
+        events=span.events,
+        links=span.links,
+        kind=span.kind,
+        status=span.status,
+        start_time=span.start_time,
+        end_time=span.end_time,
+        instrumentation_scope=span.instrumentation_scope,
+    )
+
+
+class TraceSampling(BaseInstrumentor):  # type: ignore[misc]
+    """Not an instrumentation: installs the samplers on the tracer provider lite_bootstrap builds.
+
+    Must come first among ``opentelemetry_instrumentors``, as tracers keep the sampler they were created with.
+    """
+
+    def __init__(  # noqa: PLR0913
+        self,
+        *,
+        head_ratio: float,
+        tail_ratio: float,
+        route_ratios: dict[str, float],
+        tail_latency_threshold: float,
+        tail_max_pending_traces: int,
+        exporter_endpoint: str,
+    ) -> None:
+        super().__init__()
+        self.sampler = RouteRatioSampler(head_ratio, tail_ratio, route_ratios)
+        self.tail_ratio = tail_ratio
+        self.tail_latency_threshold = tail_latency_threshold
+        self.tail_max_pending_traces = tail_max_pending_traces
+        self.exporter_endpoint = exporter_endpoint
+
+    def instrumentation_dependencies(self) -> Collection[str]:
+        return []
+
+    def _instrument(self, **kwargs: typing.Any) -> None:  # noqa: ANN401
+        tracer_provider: TracerProvider = kwargs["tracer_provider"]
+        tracer_provider.sampler = self.sampler
+        if self.tail_ratio and self.exporter_endpoint:
+            tracer_provider.add_span_processor(
+                TailSamplingSpanProcessor(
+                    OTLPSpanExporter(endpoint=self.exporter_endpoint, insecure=True),
+                    latency_threshold=self.tail_latency_threshold,
+                    max_pending_traces=self.tail_max_pending_traces,
+                )
+            )
+
+    def _uninstrument(self, **kwargs: typing.Any) -> None:  # noqa: ANN401
+        """Nothing to undo: the tracer provider is dropped on teardown."""
+
+
+class BoundedAsyncPGInstrumentor(AsyncPGInstrumentor):
+    """Captures query parameters of recorded spans only, with a bounded size and redaction.
+
+    Parameters of a statement that mentions one of ``redacted_columns`` are not captured at all.
+    """
+
+    def __init__(
+        self, *, capture_parameters: bool, max_length: int, max_items: int, redacted_columns: list[str]
+    ) -> None:
+        super().__init__(capture_parameters=False)  # type: ignore[no-untyped-call]
+        self.capture_bounded_parameters = capture_parameters
+        self.repr = reprlib.Repr(maxstring=max_length, maxother=max_length, maxlist=max_items, maxtuple=max_items)
+        self.redacted = (
+            re.compile(r"\b(" + "|".join(map(re.escape, redacted_columns)) + r")\b", re.IGNORECASE)
+            if redacted_columns
+            else None
+        )
+
+    def format_parameters(self, query: str | None, parameters: Sequence[typing.Any]) -> str:
+        if self.redacted is not None and query and self.redacted.search(query):
+            return REDACTED
+        return self.repr.repr(tuple(parameters))
+
+    def _traced(self, func: Query, query: str | None, parameters: Sequence[typing.Any]) -> Query:
+        async def traced(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:  # noqa: ANN401
+            # called inside the span started by the base instrumentor
+            span = trace.get_current_span()
+            if self.capture_bounded_parameters and parameters and span.is_recording():
+                span.set_attribute(PARAMETERS_ATTRIBUTE, self.format_parameters(query, parameters))
+            return await func(*args, **kwargs)
+
+        return traced
+
+    async def _do_execute(
+        self, func: Query, instance: asyncpg.Connection, args: tuple[typing.Any, ...], kwargs: dict[str, typing.Any]
+    ) -> typing.Any:  # noqa: ANN401
+        return await super()._do_execute(self._traced(func, args[0], args[1:]), instance, args, kwargs)  # type: ignore[no-untyped-call]
+
+    async def _do_cursor_execute(
+        self, func: Query, instance: "BaseCursor", args: tuple[typing.Any, ...], kwargs: dict[str, typing.Any]
+    ) -> typing.Any:  # noqa: ANN401
+        query, parameters = instance._query, instance._args  # noqa: SLF001
+        return await super()._do_cursor_execute(self._traced(func, query, parameters), instance, args, kwargs)  # type: ignore[no-untyped-call]
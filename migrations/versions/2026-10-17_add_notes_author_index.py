@@ -0,0 +1,40 @@
+"""add notes author index.
+
+Revision ID: 1688023570b3
+Revises: 1a7d06dd652b
+Create Date: 2026-10-17 09:12:44.518207
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "1688023570b3"
+down_revision = "1a7d06dd652b"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently so that the migration does not lock a live notes table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_notes_author_id_created_at_id"),
+            "notes",
+            ["author_id", "created_at", "id"],
+            unique=False,
+            postgresql_where=sa.text("NOT is_deleted"),
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_notes_author_id_created_at_id"),
+            table_name="notes",
+            postgresql_where=sa.text("NOT is_deleted"),
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,37 @@
+"""add notes author updated at index.
+
+Revision ID: 5b0e7c2d9a41
+Revises: 3ff8db982da3
+Create Date: 2026-10-17 14:05:31.204417
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "5b0e7c2d9a41"
+down_revision = "3ff8db982da3"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # built concurrently so that the migration does not lock a live notes table
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f("ix_notes_author_id_updated_at"),
+            "notes",
+            ["author_id", "updated_at"],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_notes_author_id_updated_at"),
+            table_name="notes",
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,82 @@
+"""add notes search vector.
+
+Revision ID: 3ff8db982da3
+Revises: 1688023570b3
+Create Date: 2026-10-17 11:40:02.731950
+
+"""
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = "3ff8db982da3"
+down_revision = "1688023570b3"
+branch_labels = None
+depends_on = None
+
+
+SEARCH_VECTOR = "setweight(to_tsvector('simple', {row}title), 'A') || setweight(to_tsvector('simple', {row}body), 'B')"
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade() -> None:
+    # a plain column kept up to date by a trigger, unlike a generated one, does not rewrite a live notes table
+    op.add_column("notes", sa.Column("search_vector", postgresql.TSVECTOR(), nullable=True))
+    op.execute(
+        f"""
+        CREATE FUNCTION notes_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector := {SEARCH_VECTOR.format(row="NEW.")};
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+        """
+    )
+    op.execute(
+        "CREATE TRIGGER notes_search_vector_update BEFORE INSERT OR UPDATE OF title, body ON notes "
+        "FOR EACH ROW EXECUTE FUNCTION notes_search_vector_update()"
+    )
+
+    # notes written from now on are covered by the trigger, older ones are filled in batches of short transactions;
+    # the statements are only built from the constants above
+    backfill = f"UPDATE notes SET search_vector = {SEARCH_VECTOR.format(row='')} WHERE search_vector IS NULL"  # noqa: S608
+    with op.get_context().autocommit_block():
+        if op.get_context().as_sql:
+            op.execute(backfill)
+        else:
+            connection = op.get_bind()
+            after = -1
+            while after is not None:
+                after = connection.execute(
+                    sa.text(
+                        "WITH batch AS (SELECT id FROM notes WHERE id > :after ORDER BY id LIMIT :size), "  # noqa: S608
+                        f"updated AS ({backfill} AND id IN (SELECT id FROM batch)) "
+                        "SELECT max(id) FROM batch"
+                    ),
+                    {"after": after, "size": BACKFILL_BATCH_SIZE},
+                ).scalar()
+
+        op.create_index(
+            op.f("ix_notes_search_vector"),
+            "notes",
+            ["search_vector"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            op.f("ix_notes_search_vector"),
+            table_name="notes",
+            postgresql_using="gin",
+            postgresql_concurrently=True,
+        )
+    op.execute("DROP TRIGGER notes_search_vector_update ON notes")
+    op.execute("DROP FUNCTION notes_search_vector_update()")
+    op.drop_column("notes", "search_vector")
@@ -0,0 +1,82 @@
+"""Compares how long a list page takes to serialize with FastAPI's default path and with ``ORJSONResponse``.
+
+Both paths start from ORM rows and build the page with ``list_page``, like ``GET /api/notes/my/`` does.
+Run with ``python -m scripts.bench_serialization [items] [body_length] [rounds]``.
+"""
+
+import asyncio
+import datetime as dt
+import sys
+import time
+import typing
+from collections.abc import Sequence
+
+from advanced_alchemy.filters import LimitOffset
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+
+from app import models, schemas
+from app.api.notes import ROUTER, list_my_notes, list_page
+from app.pagination import PaginationParams
+from app.responses import ORJSONResponse
+
+
+class RowsService:
+    """Stands in for ``NotesService``, handing ``list_page`` the same rows on every call without a database."""
+
+    def __init__(self, rows: list[models.Note]) -> None:
+        self.rows = rows
+
+    async def list_and_count(self, *_: typing.Any, **__: typing.Any) -> tuple[Sequence[models.Note], int]:  # noqa: ANN401
+        return self.rows, len(self.rows)
+
+
+def build_rows(items: int, body_length: int) -> list[models.Note]:
+    now = dt.datetime.now(dt.UTC)
+    return [
+        models.Note(
+            id=index + 1,
+            author_id=index % 10 + 1,
+            title=f"Note #{index}",
+            body="x" * body_length,
+            is_deleted=False,
+            created_at=now,
+            updated_at=now,
+        )
+        for index in range(items)
+    ]
+
+
+async def measure(render: typing.Callable[[], typing.Awaitable[bytes]], rounds: int) -> float:
+    await render()
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        await render()
+    return (time.perf_counter() - started_at) / rounds * 1000
+
+
+async def main(items: int = 100, body_length: int = 65536, rounds: int = 50) -> None:
+    service = typing.cast("typing.Any", RowsService(build_rows(items, body_length)))
+    filters = [LimitOffset(limit=items, offset=0)]
+    route = next(route for route in ROUTER.routes if isinstance(route, APIRoute) and route.endpoint is list_my_notes)
+
+    async def build_page() -> schemas.OffsetPagination[schemas.Note]:
+        page = await list_page(service, filters, PaginationParams(), schema_type=schemas.Note)
+        return typing.cast("schemas.OffsetPagination[schemas.Note]", page)
+
+    async def default_path() -> bytes:
+        # what the handler did before: return the page and let FastAPI validate it against response_model
+        content = await serialize_response(field=route.response_field, response_content=await build_page())
+        return JSONResponse(content).body
+
+    async def orjson_path() -> bytes:
+        return ORJSONResponse(await build_page()).body
+
+    default_ms, orjson_ms = await measure(default_path, rounds), await measure(orjson_path, rounds)
+    print(f"{items} notes with {body_length}-character bodies, mean of {rounds} rounds per page:")  # noqa: T201
+    print(f"  list_page + response_model validation + JSONResponse: {default_ms:.2f} ms")  # noqa: T201
+    print(f"  list_page + ORJSONResponse:                           {orjson_ms:.2f} ms ({default_ms / orjson_ms:.1f}x)")  # noqa: T201
+
+
+if __name__ == "__main__":
+    asyncio.run(main(*(int(arg) for arg in sys.argv[1:])))
@@ -0,0 +1,269 @@
+"""Load test for the notes API that reports throughput and latency percentiles per endpoint.
+
+Start the application against a local Postgres, then run::
+
+    python -m scripts.load_test --base-url http://localhost:8000 --concurrency 32 --duration 30 --output result.json
+
+Benchmark users are created directly in the database, their notes are seeded through the bulk API,
+then every virtual user logs in and drives a weighted mix of list, get, create, update and delete requests.
+Pass ``--baseline`` with the result file of an earlier run to print the change of every metric.
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import math
+import random
+import sys
+import time
+import typing
+from collections import defaultdict
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import httpx
+import sqlalchemy as sa
+from loguru import logger
+
+from app import models
+from app.constraints import NotesConstraints
+from scripts.seed_db import alchemy_config
+
+
+BENCH_PASSWORD: typing.Final = "bench-password"
+DEFAULT_WEIGHTS: typing.Final = "list=40,get=30,create=10,update=10,delete=5,login=5"
+
+
+@dataclass
+class Stats:
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+
+    def record(self, endpoint: str, started_at: float, response: httpx.Response | None) -> None:
+        self.latencies[endpoint].append((time.perf_counter() - started_at) * 1000)
+        if response is None or response.is_error:
+            self.errors[endpoint] += 1
+
+
+@dataclass
+class VirtualUser:
+    login: str
+    token: str = ""
+    note_ids: list[int] = field(default_factory=list)
+
+
+def percentile(values: list[float], rank: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(math.ceil(rank / 100 * len(ordered)) - 1, 0)]
+
+
+def note_body(rng: random.Random, mean_length: int) -> str:
+    # note sizes are heavily skewed: most notes are short, a few are close to the limit
+    length = min(int(rng.lognormvariate(math.log(mean_length), 1)), NotesConstraints.max_body_length)
+    return "".join(rng.choices("abcdefghijklmnopqrstuvwxyz     \n", k=max(length, 1)))
+
+
+async def create_users(count: int) -> list[VirtualUser]:
+    logins = [f"bench_user_{index}" for index in range(count)]
+    async with alchemy_config.get_session() as db_session:
+        existing = set(
+            (await db_session.scalars(sa.select(models.User.login).where(models.User.login.in_(logins)))).all()
+        )
+        db_session.add_all(
+            [
+                models.User(login=login, password=BENCH_PASSWORD, is_admin=False)
+                for login in logins
+                if login not in existing
+            ]
+        )
+        await db_session.commit()
+    logger.info(f"Created {count - len(existing)} benchmark users, reused {len(existing)}")
+    return [VirtualUser(login=login) for login in logins]
+
+
+async def login(client: httpx.AsyncClient, user: VirtualUser, stats: Stats | None = None) -> None:
+    started_at = time.perf_counter()
+    response = await client.post("/api/users/token/", data={"username": user.login, "password": BENCH_PASSWORD})
+    if stats is not None:
+        stats.record("login", started_at, response)
+    response.raise_for_status()
+    user.token = response.json()["access_token"]
+
+
+def auth(user: VirtualUser) -> dict[str, str]:
+    return {"Authorization": f"Bearer {user.token}"}
+
+
+async def seed_notes(client: httpx.AsyncClient, user: VirtualUser, count: int, rng: random.Random, body: int) -> None:
+    for start in range(0, count, NotesConstraints.max_bulk_items):
+        items = [
+            {"title": f"Note #{index}", "body": note_body(rng, body)}
+            for index in range(start, min(start + NotesConstraints.max_bulk_items, count))
+        ]
+        response = await client.post("/api/notes/bulk/", json={"items": items}, headers=auth(user))
+        response.raise_for_status()
+        user.note_ids.extend(item["id"] for item in response.json()["items"])
+
+
+def list_params(user: VirtualUser, rng: random.Random, args: argparse.Namespace) -> tuple[str, dict[str, typing.Any]]:
+    if rng.random() < args.cursor_ratio:
+        return "list (cursor)", {"paginationType": "cursor", "pageSize": args.page_size}
+    pages = max(len(user.note_ids) // args.page_size, 1)
+    return "list", {"pageSize": args.page_size, "currentPage": rng.randint(1, pages)}
+
+
+async def run_operation(  # noqa: PLR0913
+    client: httpx.AsyncClient,
+    user: VirtualUser,
+    operation: str,
+    stats: Stats,
+    rng: random.Random,
+    args: argparse.Namespace,
+) -> None:
+    if operation == "login":
+        await login(client, user, stats)
+        return
+    if operation in {"get", "update", "delete"} and not user.note_ids:
+        operation = "create"
+
+    started_at = time.perf_counter()
+    response: httpx.Response | None = None
+    endpoint = operation
+    try:
+        match operation:
+            case "list":
+                endpoint, params = list_params(user, rng, args)
+                response = await client.get("/api/notes/my/", params=params, headers=auth(user))
+            case "get":
+                response = await client.get(f"/api/notes/{rng.choice(user.note_ids)}/", headers=auth(user))
+            case "create":
+                note = {"title": "Benchmark note", "body": note_body(rng, args.body_length)}
+                response = await client.post("/api/notes/", json=note, headers=auth(user))
+                if response.is_success:
+                    user.note_ids.append(response.json()["id"])
+            case "update":
+                note = {"title": "Updated benchmark note", "body": note_body(rng, args.body_length)}
+                response = await client.put(f"/api/notes/{rng.choice(user.note_ids)}/", json=note, headers=auth(user))
+            case "delete":
+                note_id = user.note_ids.pop(rng.randrange(len(user.note_ids)))
+                response = await client.delete(f"/api/notes/{note_id}/", headers=auth(user))
+    except httpx.HTTPError as exc:
+        logger.warning(f"{endpoint} request has failed: {exc!r}")
+    stats.record(endpoint, started_at, response)
+
+
+async def worker(  # noqa: PLR0913
+    client: httpx.AsyncClient,
+    user: VirtualUser,
+    stats: Stats,
+    deadline: float,
+    seed: int,
+    args: argparse.Namespace,
+) -> None:
+    rng = random.Random(seed)  # noqa: S311
+    operations, weights = zip(*args.weights.items(), strict=True)
+    while time.perf_counter() < deadline:
+        await run_operation(client, user, rng.choices(operations, weights)[0], stats, rng, args)
+
+
+def summarize(stats: Stats, elapsed: float) -> dict[str, dict[str, float]]:
+    summary = {}
+    everything = [latency for latencies in stats.latencies.values() for latency in latencies]
+    for endpoint, latencies in [*sorted(stats.latencies.items()), ("total", everything)]:
+        if not latencies:
+            continue
+        errors = sum(stats.errors.values()) if endpoint == "total" else stats.errors[endpoint]
+        summary[endpoint] = {
+            "requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / elapsed, 2),
+            "mean_ms": round(sum(latencies) / len(latencies), 2),
+            "p50_ms": round(percentile(latencies, 50), 2),
+            "p95_ms": round(percentile(latencies, 95), 2),
+            "p99_ms": round(percentile(latencies, 99), 2),
+            "max_ms": round(max(latencies), 2),
+        }
+    return summary
+
+
+def print_report(summary: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]] | None) -> None:
+    columns = ["requests", "errors", "rps", "p50_ms", "p95_ms", "p99_ms", "max_ms"]
+    lines = [f"{'endpoint':<16}" + "".join(f"{column:>18}" for column in columns)]
+    for endpoint, metrics in summary.items():
+        cells = []
+        for column in columns:
+            cell = f"{metrics[column]:g}"
+            previous = (baseline or {}).get(endpoint, {}).get(column)
+            if previous:
+                cell += f" ({(metrics[column] - previous) / previous:+.0%})"
+            cells.append(f"{cell:>18}")
+        lines.append(f"{endpoint:<16}" + "".join(cells))
+    print("\n".join(lines))  # noqa: T201
+
+
+def parse_weights(value: str) -> dict[str, int]:
+    weights = {name.strip(): int(weight) for name, weight in (item.split("=") for item in value.split(","))}
+    unknown = set(weights) - {"list", "get", "create", "update", "delete", "login"}
+    if unknown:
+        msg = f"unknown operations: {', '.join(sorted(unknown))}"
+        raise argparse.ArgumentTypeError(msg)
+    return weights
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument(
+        "--users", type=int, default=32, help="benchmark users to create and log in, at least one per virtual user"
+    )
+    parser.add_argument("--notes-per-user", type=int, default=200, help="notes seeded for every user")
+    parser.add_argument("--body-length", type=int, default=2000, help="median length of a note body")
+    parser.add_argument("--concurrency", type=int, default=32, help="virtual users sending requests at once")
+    parser.add_argument("--duration", type=float, default=30, help="seconds of traffic after seeding")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--cursor-ratio", type=float, default=0.5, help="share of list requests using cursors")
+    parser.add_argument("--weights", type=parse_weights, default=parse_weights(DEFAULT_WEIGHTS))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=Path("load_test_result.json"))
+    parser.add_argument("--baseline", type=Path, help="result file of an earlier run to compare with")
+    args = parser.parse_args(argv)
+    if args.users < args.concurrency:
+        # virtual users sharing an account would delete notes the others are about to read or update
+        parser.error("--users must not be less than --concurrency")
+    return args
+
+
+async def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+    rng = random.Random(args.seed)  # noqa: S311
+    users = await create_users(args.users)
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        await asyncio.gather(*(login(client, user) for user in users))
+        await asyncio.gather(*(seed_notes(client, user, args.notes_per_user, rng, args.body_length) for user in users))
+        logger.info(f"Seeded {args.notes_per_user} notes for each of {len(users)} users, running traffic")
+
+        stats = Stats()
+        started_at = time.perf_counter()
+        deadline = started_at + args.duration
+        await asyncio.gather(
+            *(
+                worker(client, users[index], stats, deadline, args.seed + index, args)
+                for index in range(args.concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - started_at
+
+    summary = summarize(stats, elapsed)
+    baseline = json.loads(args.baseline.read_text())["endpoints"] if args.baseline else None
+    print_report(summary, baseline)
+    config = {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()}
+    result = {"finished_at": dt.datetime.now(tz=dt.UTC).isoformat(), "config": config, "endpoints": summary}
+    args.output.write_text(json.dumps(result, indent=2))
+    logger.info(f"Results are written to {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(sys.argv[1:]))
@@ -1,4 +1,13 @@
+import argparse
 import asyncio
+import datetime as dt
+import math
+import random
+import sys
+import time
+import typing
+from collections.abc import Iterator
+from dataclasses import dataclass
 from pathlib import Path
 
 from advanced_alchemy.base import BigIntAuditBase
@@ -9,6 +18,8 @@ from loguru import logger
 from sqlalchemy.ext.asyncio import create_async_engine
 
 from app import models
+from app.constraints import NotesConstraints
+from app.models.users import pwd_context
 from app.repositories import UsersRepository
 from app.settings import settings
 
@@ -57,14 +68,168 @@ async def seed_database() -> None:
                 logger.error("Note fixtures not found")
 
 
-async def main() -> None:
+USER_COLUMNS: typing.Final = ("id", "login", "password", "is_admin", "created_at", "updated_at")
+NOTE_COLUMNS: typing.Final = ("title", "body", "author_id", "is_deleted", "created_at", "updated_at")
+VOCABULARY: typing.Final = (
+    "note meeting idea todo project plan review draft release deploy fix bug feature test data report "
+    "customer budget design sprint backlog retro agenda summary follow up call email schedule deadline"
+)
+
+
+@dataclass(frozen=True, kw_only=True)
+class SyntheticDataset:
+    """Shape of the generated data; counts and lengths are drawn from log-normal distributions."""
+
+    users: int
+    notes_per_user: float
+    notes_per_user_sigma: float
+    body_length: int
+    body_length_sigma: float
+    deleted_ratio: float
+    days: int
+    password: str
+    seed: int
+
+
+def lognormal(rng: random.Random, mean: float, sigma: float) -> float:
+    # mu is chosen so that ``mean`` is the mean of the distribution rather than its median
+    return rng.lognormvariate(math.log(mean) - sigma**2 / 2, sigma) if sigma and mean else mean
+
+
+def build_corpus(rng: random.Random) -> str:
+    # bodies are slices of one shared text, which is much faster than generating every body word by word
+    words = rng.choices(VOCABULARY.split(), k=NotesConstraints.max_body_length)
+    return " ".join(words)
+
+
+def user_rows(
+    first_id: int, count: int, password_hash: str, rng: random.Random, dataset: SyntheticDataset
+) -> Iterator[tuple[typing.Any, ...]]:
+    now = dt.datetime.now(tz=dt.UTC)
+    for user_id in range(first_id, first_id + count):
+        created_at = now - dt.timedelta(seconds=rng.uniform(0, dataset.days * 86400))
+        yield user_id, f"synthetic_{user_id}", password_hash, False, created_at, created_at
+
+
+def note_rows(
+    first_id: int, count: int, corpus: str, rng: random.Random, dataset: SyntheticDataset
+) -> Iterator[tuple[typing.Any, ...]]:
+    now = dt.datetime.now(tz=dt.UTC)
+    max_length = NotesConstraints.max_body_length
+    for author_id in range(first_id, first_id + count):
+        for index in range(round(lognormal(rng, dataset.notes_per_user, dataset.notes_per_user_sigma))):
+            length = min(max(round(lognormal(rng, dataset.body_length, dataset.body_length_sigma)), 1), max_length)
+            offset = rng.randrange(len(corpus) - length + 1)
+            created_at = now - dt.timedelta(seconds=rng.uniform(0, dataset.days * 86400))
+            updated_at = created_at + (now - created_at) * rng.random() ** 4
+            is_deleted = rng.random() < dataset.deleted_ratio
+            yield f"Note #{index + 1}", corpus[offset : offset + length], author_id, is_deleted, created_at, updated_at
+
+
+async def reserve_user_ids(count: int) -> int:
+    # moves the sequence past the whole block at once, so the block must not be loaded while the app serves writes
+    async with alchemy_config.get_engine().connect() as connection:
+        raw_connection = (await connection.get_raw_connection()).driver_connection
+        return typing.cast(
+            "int",
+            await raw_connection.fetchval(
+                "SELECT setval(pg_get_serial_sequence('users', 'id'), nextval(pg_get_serial_sequence('users', 'id'))"
+                " + $1 - 1) - $1 + 1",
+                count,
+            ),
+        )
+
+
+async def copy_batches(  # noqa: PLR0913
+    batches: Iterator[int],
+    first_id: int,
+    batch_size: int,
+    password_hash: str,
+    corpus: str,
+    dataset: SyntheticDataset,
+) -> int:
+    copied = 0
+    async with alchemy_config.get_engine().connect() as connection:
+        raw_connection = (await connection.get_raw_connection()).driver_connection
+        for start in batches:
+            count = min(batch_size, dataset.users - start)
+            rng = random.Random(dataset.seed + start)  # noqa: S311
+            async with raw_connection.transaction():
+                await raw_connection.copy_records_to_table(
+                    "users",
+                    records=user_rows(first_id + start, count, password_hash, rng, dataset),
+                    columns=USER_COLUMNS,
+                )
+                result = await raw_connection.copy_records_to_table(
+                    "notes", records=note_rows(first_id + start, count, corpus, rng, dataset), columns=NOTE_COLUMNS
+                )
+            copied += int(result.split()[-1])
+            logger.info(f"Copied users #{first_id + start}-#{first_id + start + count - 1} and their notes")
+    return copied
+
+
+async def seed_synthetic_database(dataset: SyntheticDataset, workers: int, batch_size: int) -> None:
+    started_at = time.perf_counter()
+    # argon2 is deliberately slow, so every synthetic user shares a single hash of the same password
+    password_hash = pwd_context.hash(dataset.password)
+    corpus = build_corpus(random.Random(dataset.seed))  # noqa: S311
+    first_id = await reserve_user_ids(dataset.users)
+    batches = iter(range(0, dataset.users, batch_size))
+    copied = await asyncio.gather(
+        *(copy_batches(batches, first_id, batch_size, password_hash, corpus, dataset) for _ in range(workers))
+    )
+
+    async with alchemy_config.get_engine().connect() as connection:
+        raw_connection = (await connection.get_raw_connection()).driver_connection
+        await raw_connection.execute("ANALYZE users, notes")
+    logger.info(
+        f"Seeded {dataset.users} synthetic users and {sum(copied)} notes in {time.perf_counter() - started_at:.1f}s, "
+        f"their password is '{dataset.password}'"
+    )
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fill the database with fixtures or a large synthetic dataset")
+    parser.add_argument("--synthetic", action="store_true", help="generate users and notes and load them with COPY")
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--notes-per-user", type=float, default=20, help="mean number of notes of a user")
+    parser.add_argument("--notes-per-user-sigma", type=float, default=1, help="0 gives every user the same count")
+    parser.add_argument("--body-length", type=int, default=1000, help="mean length of a note body")
+    parser.add_argument("--body-length-sigma", type=float, default=1.2, help="0 gives every note the same length")
+    parser.add_argument("--deleted-ratio", type=float, default=0.05, help="share of soft-deleted notes")
+    parser.add_argument("--days", type=int, default=365, help="period the creation dates are spread over")
+    parser.add_argument("--password", default="synthetic", help="password of every synthetic user")
+    parser.add_argument("--workers", type=int, default=4, help="connections loading data in parallel")
+    parser.add_argument("--batch-size", type=int, default=1000, help="users per COPY batch, with their notes")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+async def main(argv: list[str]) -> None:
+    args = parse_args(argv)
+
     # Initialize the database
     await initialize_database()
 
+    if args.synthetic:
+        dataset = SyntheticDataset(
+            users=args.users,
+            notes_per_user=args.notes_per_user,
+            notes_per_user_sigma=args.notes_per_user_sigma,
+            body_length=args.body_length,
+            body_length_sigma=args.body_length_sigma,
+            deleted_ratio=args.deleted_ratio,
+            days=args.days,
+            password=args.password,
+            seed=args.seed,
+        )
+        await seed_synthetic_database(dataset, workers=args.workers, batch_size=args.batch_size)
+        return
+
     # Seed the database
     await seed_database()
 
 
 if __name__ == "__main__":
     # Run the async main function
-    asyncio.run(main())
+    asyncio.run(main(sys.argv[1:]))
@@ -1,3 +1,5 @@
+import typing
+
 from polyfactory.factories.sqlalchemy_factory import SQLAlchemyFactory
 from polyfactory.pytest_plugin import register_fixture
 
@@ -12,6 +14,11 @@ class NoteFactory(SQLAlchemyFactory[models.Note]):
     id = None
     is_deleted = False
 
+    @classmethod
+    def should_column_be_set(cls, column: typing.Any) -> bool:  # noqa: ANN401
+        # columns the database fills in, like the search vector, are left to it
+        return super().should_column_be_set(column) and getattr(column, "server_default", None) is None
+
 
 @register_fixture
 class UserFactory(SQLAlchemyFactory[models.User]):
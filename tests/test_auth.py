@@ -1,12 +1,19 @@
+import asyncio
 import datetime as dt
 
 import fastapi
 import jwt
+import modern_di
 import pytest
+import sqlalchemy as sa
 from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import ioc, models
 from app.error_messages import UserErrorMessages
+from app.repositories import UsersService
 from app.settings import settings
+from tests.utils import get_token
 
 
 @pytest.fixture
@@ -19,6 +26,11 @@ def time_in_past() -> dt.datetime:
     return dt.datetime.now(dt.UTC) - dt.timedelta(days=1)
 
 
+@pytest.fixture
+def trust_claims(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "jwt_trust_claims", True)
+
+
 async def test_no_credentials(client: AsyncClient) -> None:
     response = await client.get("/api/notes/my/")
     assert response.status_code == fastapi.status.HTTP_401_UNAUTHORIZED
@@ -48,6 +60,19 @@ async def test_get_token_for_nonexistent_user(client: AsyncClient) -> None:
     assert response.json()["detail"] == UserErrorMessages.wrong_login_pass
 
 
+async def test_get_token_when_password_hasher_is_busy(
+    user_client: AsyncClient, di_container: modern_di.Container, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    password_hasher = await ioc.Dependencies.password_hasher.async_resolve(di_container)
+    monkeypatch.setattr(password_hasher, "in_flight", password_hasher.max_workers + password_hasher.max_queue)
+    response = await user_client.post(
+        "/api/users/token/", data={"username": user_client.user.login, "password": "password"}
+    )
+    assert response.status_code == fastapi.status.HTTP_503_SERVICE_UNAVAILABLE
+    assert response.headers["Retry-After"] == "1"
+    assert response.json()["detail"] == UserErrorMessages.login_busy
+
+
 async def test_get_token_wrong_password(user_client: AsyncClient) -> None:
     response = await user_client.post(
         "/api/users/token/", data={"username": user_client.user.login, "password": "wrong_password"}
@@ -88,3 +113,111 @@ async def test_invalid_token_expired(user_client: AsyncClient, time_in_past: dt.
     )
     assert response.status_code == fastapi.status.HTTP_401_UNAUTHORIZED
     assert response.json()["detail"] == UserErrorMessages.invalid_token
+
+
+async def test_principal_is_cached(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    response = await user_client.get("/api/notes/")
+    assert response.status_code == fastapi.status.HTTP_403_FORBIDDEN
+
+    await db_session.execute(sa.update(models.User).where(models.User.id == user_client.user.id).values(is_admin=True))
+    response = await user_client.get("/api/notes/")
+    assert response.status_code == fastapi.status.HTTP_403_FORBIDDEN
+
+
+async def test_principal_cache_invalidated_on_update(
+    user_client: AsyncClient, db_session: AsyncSession, di_container: modern_di.Container
+) -> None:
+    response = await user_client.get("/api/notes/")
+    assert response.status_code == fastapi.status.HTTP_403_FORBIDDEN
+
+    principals_cache = await ioc.Dependencies.principals_cache.async_resolve(di_container)
+    users_service = UsersService(session=db_session, principals_cache=principals_cache)
+    await users_service.update({"is_admin": True}, item_id=user_client.user.id)
+    response = await user_client.get("/api/notes/")
+    assert response.status_code == fastapi.status.HTTP_200_OK
+
+
+async def test_principal_cache_invalidated_on_delete(
+    user_client: AsyncClient, db_session: AsyncSession, di_container: modern_di.Container
+) -> None:
+    response = await user_client.get("/api/notes/my/")
+    assert response.status_code == fastapi.status.HTTP_200_OK
+
+    principals_cache = await ioc.Dependencies.principals_cache.async_resolve(di_container)
+    users_service = UsersService(session=db_session, principals_cache=principals_cache)
+    await users_service.delete(item_id=user_client.user.id)
+    response = await user_client.get("/api/notes/my/")
+    assert response.status_code == fastapi.status.HTTP_401_UNAUTHORIZED
+
+
+async def test_token_contains_principal_claims(user_client: AsyncClient) -> None:
+    token = await get_token(user_client, user_client.user)
+    payload = jwt.decode(token, settings.jwt_secret_key, algorithms=[settings.jwt_algorithm])
+    assert payload["sub"] == user_client.user.login
+    assert payload["uid"] == user_client.user.id
+    assert payload["role"] == "user"
+    assert "iat" in payload
+
+
+async def test_invalid_token_malformed_claims(client: AsyncClient, time_in_future: dt.datetime) -> None:
+    token = jwt.encode(
+        {"sub": "some_user", "uid": "not_an_id", "exp": time_in_future},
+        settings.jwt_secret_key,
+        algorithm=settings.jwt_algorithm,
+    )
+    response = await client.get(
+        "/api/notes/my/",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == fastapi.status.HTTP_401_UNAUTHORIZED
+    assert response.json()["detail"] == UserErrorMessages.invalid_token
+
+
+@pytest.mark.usefixtures("trust_claims")
+async def test_trusted_claims_skip_users_lookup(
+    client: AsyncClient, di_container: modern_di.Container, time_in_future: dt.datetime
+) -> None:
+    # tokens issued before the process subscribed to revocations are always looked up
+    listener = await ioc.Dependencies.change_listener.async_resolve(di_container)
+    await asyncio.wait_for(listener.ready.wait(), timeout=5)
+    token_revocations = await ioc.Dependencies.token_revocations.async_resolve(di_container)
+    token_revocations.distrusted_until = 0
+    token = jwt.encode(
+        {"sub": "nonexistent_user", "uid": 1, "role": "user", "iat": dt.datetime.now(dt.UTC), "exp": time_in_future},
+        settings.jwt_secret_key,
+        algorithm=settings.jwt_algorithm,
+    )
+    response = await client.get(
+        "/api/notes/my/",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == fastapi.status.HTTP_200_OK
+
+
+@pytest.mark.usefixtures("trust_claims")
+async def test_trusted_claims_incomplete(client: AsyncClient, time_in_future: dt.datetime) -> None:
+    token = jwt.encode(
+        {"sub": "nonexistent_user", "exp": time_in_future}, settings.jwt_secret_key, algorithm=settings.jwt_algorithm
+    )
+    response = await client.get(
+        "/api/notes/my/",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    assert response.status_code == fastapi.status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.usefixtures("trust_claims")
+async def test_trusted_claims_revoked_on_role_change(
+    user_client: AsyncClient, db_session: AsyncSession, di_container: modern_di.Container
+) -> None:
+    response = await user_client.get("/api/notes/")
+    assert response.status_code == fastapi.status.HTTP_403_FORBIDDEN
+
+    users_service = UsersService(
+        session=db_session,
+        principals_cache=await ioc.Dependencies.principals_cache.async_resolve(di_container),
+        token_revocations=await ioc.Dependencies.token_revocations.async_resolve(di_container),
+    )
+    await users_service.update({"is_admin": True}, item_id=user_client.user.id)
+    response = await user_client.get("/api/notes/")
+    assert response.status_code == fastapi.status.HTTP_200_OK
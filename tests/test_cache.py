@@ -0,0 +1,147 @@
+import pytest
+
+from app.cache import TokenRevocations, TTLCache
+
+
+def test_cache_expires_entries(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    cache: TTLCache[str, str] = TTLCache(max_size=2, ttl=10)
+    cache.set("a", "first")
+    assert cache.get("a") == "first"
+
+    now += 10
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache: TTLCache[str, str] = TTLCache(max_size=2, ttl=60)
+    cache.set("a", "first")
+    cache.set("b", "second")
+    cache.get("a")
+    cache.set("c", "third")
+    assert cache.get("a") == "first"
+    assert cache.get("b") is None
+    assert cache.get("c") == "third"
+
+
+def test_cache_invalidation() -> None:
+    cache: TTLCache[str, str] = TTLCache(max_size=3, ttl=60)
+    cache.set("a", "first")
+    cache.set("b", "second")
+    cache.set("c", "third")
+    cache.pop("a")
+    cache.discard_where(lambda value: value == "second")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == "third"
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_cache_skips_values_invalidated_while_loading() -> None:
+    cache: TTLCache[str, str] = TTLCache(max_size=2, ttl=60)
+    generation = cache.generation
+    cache.pop("a")
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is None
+
+    # an invalidation of another key does not get in the way
+    generation = cache.generation
+    cache.pop("b")
+    cache.set("a", "fresh", generation=generation)
+    assert cache.get("a") == "fresh"
+
+    generation = cache.generation
+    cache.discard_where(lambda value: value == "fresh")
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is None
+
+    # once more keys are invalidated than are remembered, the forgotten ones count as invalidated just now
+    generation = cache.generation
+    cache.pop("a")
+    cache.pop("b")
+    cache.pop("c")
+    cache.set("a", "stale", generation=generation)
+    assert cache.get("a") is None
+    cache.set("d", "stale", generation=generation)
+    assert cache.get("d") is None
+    cache.set("d", "fresh", generation=cache.generation)
+    assert cache.get("d") == "fresh"
+
+    generation = cache.generation
+    cache.clear()
+    cache.set("d", "stale", generation=generation)
+    assert cache.get("d") is None
+
+
+def test_cache_disabled() -> None:
+    cache: TTLCache[str, str] = TTLCache(max_size=0, ttl=60)
+    cache.set("a", "first")
+    assert cache.get("a") is None
+
+
+def test_cache_is_bounded_by_size_in_bytes() -> None:
+    cache: TTLCache[str, str] = TTLCache(max_size=10, ttl=60, max_bytes=10, sizeof=len)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.set("a", "aaa")
+    assert cache.size_bytes == len("bbbbaaa")
+
+    cache.set("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaa"
+    assert cache.size_bytes == len("aaacccc")
+    assert cache.evictions == 1
+
+    # a value that can never fit is not stored and does not push anything else out
+    cache.set("a", "a" * 11)
+    assert cache.get("a") is None
+    assert cache.get("c") == "cccc"
+    assert cache.size_bytes == len("cccc")
+
+
+def test_cache_metrics(monkeypatch: pytest.MonkeyPatch) -> None:
+    now = 100.0
+    monkeypatch.setattr("time.monotonic", lambda: now)
+    cache: TTLCache[str, str] = TTLCache(max_size=1, ttl=10)
+    cache.set("a", "first")
+    cache.get("a")
+    cache.get("b")
+    cache.set("b", "second")
+
+    now += 10
+    cache.get("b")
+    assert (cache.hits, cache.misses, cache.evictions) == (1, 2, 1)
+
+
+def test_token_revocations() -> None:
+    revocations = TokenRevocations(max_size=1, ttl=60)
+    assert not revocations.is_revoked(1, issued_at=100)
+    assert revocations.is_revoked(1, issued_at=None)
+
+    revocations.revoke(1, at=100.5)
+    revocations.revoke(1, at=99)
+    assert revocations.is_revoked(1, issued_at=100)
+    assert not revocations.is_revoked(1, issued_at=101)
+    assert not revocations.is_revoked(2, issued_at=100)
+
+    # the evicted revocation of the first user leaves every token issued up to it distrusted
+    revocations.revoke(2, at=200)
+    assert len(revocations) == 1
+    assert revocations.is_revoked(1, issued_at=100)
+    assert revocations.is_revoked(3, issued_at=100)
+    assert not revocations.is_revoked(3, issued_at=101)
+
+    revocations.distrust_until(300)
+    assert revocations.is_revoked(3, issued_at=300)
+    assert not revocations.is_revoked(3, issued_at=301)
+
+
+def test_token_revocations_disabled() -> None:
+    revocations = TokenRevocations(max_size=0, ttl=60)
+    revocations.revoke(1, at=100)
+    assert len(revocations) == 0
+    assert revocations.is_revoked(2, issued_at=100)
+    assert not revocations.is_revoked(2, issued_at=101)
@@ -0,0 +1,94 @@
+import gzip
+import json
+import typing
+
+import brotli
+import pytest
+import zstandard
+from fastapi import status
+from httpx import AsyncClient
+
+from app.error_messages import RequestErrorMessages
+from app.settings import settings
+
+
+COMPRESSORS: dict[str, typing.Callable[[bytes], bytes]] = {
+    "gzip": gzip.compress,
+    "br": brotli.compress,
+    "zstd": zstandard.ZstdCompressor().compress,
+}
+
+
+@pytest.mark.parametrize("encoding", list(COMPRESSORS))
+async def test_compressed_request_and_response(user_client: AsyncClient, encoding: str) -> None:
+    note = {"title": "compressed", "body": "note body " * 1000}
+    response = await user_client.post(
+        "/api/notes/",
+        content=COMPRESSORS[encoding](json.dumps(note).encode()),
+        headers={"Content-Encoding": encoding, "Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    item_id = response.json()["id"]
+
+    response = await user_client.put(
+        f"/api/notes/{item_id}/",
+        content=COMPRESSORS[encoding](json.dumps({**note, "title": "updated"}).encode()),
+        headers={"Content-Encoding": encoding, "Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await user_client.get(f"/api/notes/{item_id}/", headers={"Accept-Encoding": encoding})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Encoding"] == encoding
+    assert response.json()["title"] == "updated"
+    assert response.json()["body"] == note["body"]
+
+
+async def test_small_response_is_not_compressed(user_client: AsyncClient) -> None:
+    response = await user_client.get("/api/notes/my/", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "Content-Encoding" not in response.headers
+
+
+@pytest.mark.parametrize("encoding", list(COMPRESSORS))
+async def test_compressed_request_too_large(
+    user_client: AsyncClient, encoding: str, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "request_max_decompressed_size", 1000)
+    response = await user_client.post(
+        "/api/notes/",
+        content=COMPRESSORS[encoding](json.dumps({"title": "title", "body": "x" * 2000}).encode()),
+        headers={"Content-Encoding": encoding, "Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_413_CONTENT_TOO_LARGE
+    assert response.json()["detail"] == RequestErrorMessages.body_too_large
+
+
+@pytest.mark.parametrize("encoding", list(COMPRESSORS))
+@pytest.mark.parametrize("malformation", ["truncated", "not compressed", "trailing data"])
+async def test_compressed_request_malformed(user_client: AsyncClient, encoding: str, malformation: str) -> None:
+    body = COMPRESSORS[encoding](json.dumps({"title": "title", "body": "body"}).encode())
+    match malformation:
+        case "truncated":
+            body = body[:-4]
+        case "not compressed":
+            body = b"not compressed at all"
+        case "trailing data":
+            body += b"junk"
+    response = await user_client.post(
+        "/api/notes/",
+        content=body,
+        headers={"Content-Encoding": encoding, "Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == RequestErrorMessages.malformed_body
+
+
+async def test_compressed_request_unsupported_encoding(user_client: AsyncClient) -> None:
+    response = await user_client.post(
+        "/api/notes/",
+        content=b"{}",
+        headers={"Content-Encoding": "compress", "Content-Type": "application/json"},
+    )
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    assert response.headers["Accept-Encoding"] == "gzip, br, zstd"
@@ -0,0 +1,47 @@
+import typing
+
+from app.error_messages import NotesErrorMessages
+from app.imports import ImportFormat, csv_records, parse_notes, split_lines
+
+
+async def stream(*chunks: bytes) -> typing.AsyncIterator[bytes]:
+    for chunk in chunks:
+        yield chunk
+
+
+async def test_split_lines() -> None:
+    chunks = stream(b"fir", b"st\r\nsec", b"ond\n", b"toolong", b"longer", b"\nlast")
+    lines = [line async for line in split_lines(chunks, max_line_size=10)]
+    assert lines == [(1, b"first"), (2, b"second"), (3, None), (4, b"last")]
+
+
+async def test_split_lines_overlong_last_line() -> None:
+    lines = [line async for line in split_lines(stream(b"ok\n", b"too long line"), max_line_size=10)]
+    assert lines == [(1, b"ok"), (2, None)]
+
+
+async def test_csv_records() -> None:
+    chunks = stream(b'title,body\n"a\n\n",b\n"\xff",b\n', b'"long\n', b"long\n", b'long"\n', b"x,y\n")
+    records = [record async for record in csv_records(split_lines(chunks, 100), max_record_size=12)]
+    assert records == [
+        (1, ["title", "body"]),
+        (2, ["a\n\n", "b"]),
+        (5, NotesErrorMessages.import_line_not_utf8),
+        (6, NotesErrorMessages.import_line_too_long),
+        (9, ["x", "y"]),
+    ]
+
+
+async def test_csv_records_overlong_line() -> None:
+    chunks = stream(b'title,body\n"quoted\n', b"x" * 20 + b"\n", b'"unterminated')
+    records = [record async for record in csv_records(split_lines(chunks, 15), max_record_size=100)]
+    assert records == [
+        (1, ["title", "body"]),
+        (2, NotesErrorMessages.import_line_too_long),
+        (4, NotesErrorMessages.import_unterminated_quote),
+    ]
+
+
+async def test_parse_ndjson_too_long_line() -> None:
+    lines = [line async for line in parse_notes(stream(b"x" * 20), ImportFormat.ndjson, max_line_size=10)]
+    assert [(line.line, line.error) for line in lines] == [(1, NotesErrorMessages.import_line_too_long)]
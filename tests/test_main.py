@@ -5,11 +5,15 @@ import modern_di
 import pytest
 
 from app import ioc
+from app.settings import settings
 
 
 def test_main(monkeypatch: pytest.MonkeyPatch) -> None:
-    monkeypatch.setattr("granian.Granian", mock.Mock())
+    server = mock.Mock()
+    monkeypatch.setattr("granian.Granian", server)
     runpy.run_module("app.__main__", run_name="__main__")
+    assert server.call_args.kwargs["workers"] == settings.app_workers
+    assert server.call_args.kwargs["runtime_threads"] == settings.app_runtime_threads
 
 
 async def test_session() -> None:
@@ -0,0 +1,66 @@
+from fastapi import status
+from fastapi.routing import APIRoute
+from httpx import AsyncClient
+from prometheus_client import CollectorRegistry
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.api.notes import ACTIONS_LOG_SINK
+from app.metrics import RuntimeCollector, route_template
+from app.passwords import PasswordHasher
+from app.settings import settings
+
+
+async def test_metrics(user_client: AsyncClient) -> None:
+    response = await user_client.get("/api/notes/my/")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await user_client.get("/missing/")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    response = await user_client.get("/openapi.json")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await user_client.get("/metrics")
+    assert response.status_code == status.HTTP_200_OK
+    metrics = response.text
+    assert 'http_request_duration_seconds_bucket{handler="/api/notes/my/",le="0.005",method="GET"}' in metrics
+    assert 'http_requests_in_flight{handler="/api/notes/my/",method="GET"} 0.0' in metrics
+    assert 'http_requests_in_flight{handler="/metrics",method="GET"} 1.0' in metrics
+    assert 'http_requests_in_flight{handler="none",method="GET"} 0.0' in metrics
+    assert 'http_requests_in_flight{handler="/openapi.json",method="GET"} 0.0' in metrics
+    assert 'http_request_duration_seconds_count{handler="/metrics"' not in metrics
+    for name in (
+        "db_pool_wait_seconds_count",
+        "db_pool_checked_out",
+        "db_pool_overflow",
+        'password_hasher_duration_seconds_count{operation="verify"}',
+        "password_hasher_queue_depth 0.0",
+        "actions_log_queue_depth",
+        "actions_log_dropped_total",
+        'cache_hits_total{cache="principals"}',
+        'cache_entries{cache="notes"}',
+    ):
+        assert name in metrics
+
+
+def test_runtime_collector_without_queue_pool() -> None:
+    password_hasher = PasswordHasher(max_workers=1, max_queue=1)
+    registry = CollectorRegistry()
+    registry.register(
+        RuntimeCollector(
+            engine=create_async_engine(settings.db_dsn, poolclass=NullPool),
+            password_hasher=password_hasher,
+            action_log=ACTIONS_LOG_SINK,
+            caches={},
+        )
+    )
+    assert registry.get_sample_value("db_pool_checked_out") is None
+    assert registry.get_sample_value("password_hasher_in_flight") == 0
+    password_hasher.shutdown()
+
+
+def test_route_template_of_matched_route() -> None:
+    route = APIRoute("/items/{item_id}/", lambda: None)
+    # without the application in the scope, the template can only come from the route the router has matched
+    assert route_template({"type": "http", "route": route}) == "/items/{item_id}/"
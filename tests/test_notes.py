@@ -1,13 +1,21 @@
+import datetime as dt
+import json
+import typing
 from enum import StrEnum
 
+import modern_di
 import pytest
+import sqlalchemy as sa
 from fastapi import status
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import ioc, models, repositories, schemas
+from app.constraints import NotesConstraints
 from app.error_messages import NotesErrorMessages
+from app.settings import settings
 from tests import factories
-from tests.utils import get_user, user_auth
+from tests.utils import assert_num_queries, capture_statements, explain, get_user, user_auth
 
 
 class InputExamples(StrEnum):
@@ -75,6 +83,144 @@ async def test_get_notes_from_other_user(user_client: AsyncClient, db_session: A
     assert len(data["items"]) == 0
 
 
+async def test_get_notes_cursor_pagination(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    notes = [await factories.NoteFactory.create_async(author_id=user_client.user.id) for _ in range(3)]
+    notes.sort(key=lambda note: (note.created_at, note.id))
+
+    response = await user_client.get("/api/notes/my/", params={"paginationType": "cursor", "pageSize": 2})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [note.id for note in notes[:2]]
+    assert data["next_cursor"] is not None
+
+    response = await user_client.get(
+        "/api/notes/my/", params={"paginationType": "cursor", "pageSize": 2, "cursor": data["next_cursor"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [notes[2].id]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "invalid",
+        "WzFd",
+        "WyIyMDI1LTAxLTAxVDAwOjAwOjAwIiwgMV0",
+        # ids of 1e400 and 2 ** 63
+        "WyIyMDI1LTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgMWU0MDBd",
+        "WyIyMDI1LTAxLTAxVDAwOjAwOjAwKzAwOjAwIiwgOTIyMzM3MjAzNjg1NDc3NTgwOF0",
+    ],
+)
+async def test_get_notes_invalid_cursor(user_client: AsyncClient, cursor: str) -> None:
+    response = await user_client.get("/api/notes/my/", params={"paginationType": "cursor", "cursor": cursor})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == NotesErrorMessages.invalid_cursor
+
+
+@pytest.mark.parametrize(
+    ("params", "page_plan"),
+    [
+        # offset pages are not ordered, so any index on the author serves them
+        ({}, "Index Cond: (author_id = "),
+        ({"paginationType": "cursor"}, "ix_notes_author_id_created_at_id"),
+    ],
+)
+async def test_get_notes_uses_author_index(
+    user_client: AsyncClient, db_session: AsyncSession, params: dict[str, str], page_plan: str
+) -> None:
+    # the test tables are tiny, so sequential scans would always win without this, and the author indexes tie
+    # unless the plan has to come out in order without sorting, as it does once an author has many notes
+    for setting in ("enable_seqscan", "enable_bitmapscan", "enable_sort"):
+        await db_session.execute(sa.text(f"SET LOCAL {setting} = off"))
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.get("/api/notes/my/", params=params)
+    assert response.status_code == status.HTTP_200_OK
+
+    validator, page = [item for item in statements if "FROM notes" in item[0]]
+    # read as a single-row probe of the index
+    assert "ix_notes_author_id_updated_at" in await explain(db_session, *validator)
+    assert page_plan in await explain(db_session, *page)
+
+
+@pytest.mark.parametrize("pagination_type", ["limit_offset", "cursor"])
+@pytest.mark.parametrize("preview_length", [None, 5])
+async def test_get_notes_summary(
+    user_client: AsyncClient, db_session: AsyncSession, pagination_type: str, preview_length: int | None
+) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id, body="a rather long body")
+    params = {"fields": "summary", "paginationType": pagination_type}
+    if preview_length is not None:
+        params["previewLength"] = str(preview_length)
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.get("/api/notes/my/", params=params)
+    assert response.status_code == status.HTTP_200_OK
+    statement = next(statement for statement, _ in statements if "FROM notes" in statement)
+    assert "notes.body AS" not in statement
+
+    [item] = response.json()["items"]
+    assert "body" not in item
+    assert item["id"] == note.id
+    assert item["title"] == note.title
+    assert item["updated_at"] is not None
+    assert item["body_preview"] == (note.body[:preview_length] if preview_length is not None else None)
+
+
+@pytest.mark.parametrize("preview_length", ["0", "1025"])
+async def test_get_notes_summary_invalid_preview_length(user_client: AsyncClient, preview_length: str) -> None:
+    response = await user_client.get("/api/notes/my/", params={"fields": "summary", "previewLength": preview_length})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+async def test_search_my_notes(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    title_match = await factories.NoteFactory.create_async(
+        author_id=user_client.user.id, title="apple pie", body="sweet dessert"
+    )
+    body_match = await factories.NoteFactory.create_async(
+        author_id=user_client.user.id, title="dessert", body="made with an apple and cinnamon"
+    )
+    await factories.NoteFactory.create_async(author_id=user_client.user.id, title="banana", body="bread")
+    await factories.NoteFactory.create_async(author_id=user_client.user.id, title="apple", body="gone", is_deleted=True)
+    await factories.NoteFactory.create_async(author_id=second_user.id, title="apple", body="someone else's")
+
+    response = await user_client.get("/api/notes/my/search/", params={"q": "apple", "pageSize": 1})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [title_match.id]
+    assert data["next_cursor"] is not None
+
+    response = await user_client.get(
+        "/api/notes/my/search/", params={"q": "apple", "pageSize": 1, "cursor": data["next_cursor"]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [body_match.id]
+    assert data["next_cursor"] is None
+
+
+@pytest.mark.parametrize(
+    ("params", "status_code"),
+    [
+        ({"q": ""}, status.HTTP_422_UNPROCESSABLE_CONTENT),
+        ({"q": "apple", "cursor": "invalid"}, status.HTTP_400_BAD_REQUEST),
+        ({"q": "apple", "cursor": "WyJhIiwgMV0"}, status.HTTP_400_BAD_REQUEST),
+        # an id of 1e400
+        ({"q": "apple", "cursor": "WzEuMCwgMWU0MDBd"}, status.HTTP_400_BAD_REQUEST),
+        ({"q": "apple", "pageSize": str(NotesConstraints.max_page_size + 1)}, status.HTTP_422_UNPROCESSABLE_CONTENT),
+    ],
+)
+async def test_search_my_notes_invalid(user_client: AsyncClient, params: dict[str, str], status_code: int) -> None:
+    response = await user_client.get("/api/notes/my/search/", params=params)
+    assert response.status_code == status_code
+
+
 async def test_get_one_note(user_client: AsyncClient, db_session: AsyncSession) -> None:
     factories.NoteFactory.__async_session__ = db_session
     note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
@@ -88,6 +234,92 @@ async def test_get_one_note(user_client: AsyncClient, db_session: AsyncSession)
         assert v == getattr(note, k)
 
 
+async def test_get_one_note_cached(
+    user_client: AsyncClient, db_session: AsyncSession, di_container: modern_di.Container
+) -> None:
+    notes_cache = await ioc.Dependencies.notes_cache.async_resolve(di_container)
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.get(f"/api/notes/{note.id}/")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["ETag"] == etag
+        assert response.json()["body"] == note.body
+        response = await user_client.get(f"/api/notes/{note.id}/", headers={"If-None-Match": etag})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert not [statement for statement, _ in statements if "FROM notes" in statement]
+    assert notes_cache.hits == 2  # noqa: PLR2004
+
+    response = await user_client.put(f"/api/notes/{note.id}/", json={"title": "some", "body": "once told me"})
+    assert response.status_code == status.HTTP_200_OK
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.json()["body"] == "once told me"
+
+
+async def test_get_one_note_skips_caching_row_invalidated_while_loading(
+    user_client: AsyncClient,
+    db_session: AsyncSession,
+    di_container: modern_di.Container,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    notes_cache = await ioc.Dependencies.notes_cache.async_resolve(di_container)
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+    notes_service = repositories.NotesService(session=db_session, cache=notes_cache)
+    get_one = notes_service.get_one
+
+    async def get_one_then_invalidate(*args: typing.Any, **kwargs: typing.Any) -> models.Note:  # noqa: ANN401
+        instance = await get_one(*args, **kwargs)
+        # another request commits a change to the note and drops it from the cache before this read resumes
+        notes_cache.pop(note.id)
+        return instance
+
+    monkeypatch.setattr(notes_service, "get_one", get_one_then_invalidate)
+    await notes_service.get_one_with_access_check(note.id, user_client.user)
+    assert notes_cache.get(note.id) is None
+
+    monkeypatch.setattr(notes_service, "get_one", get_one)
+    await notes_service.get_one_with_access_check(note.id, user_client.user)
+    assert notes_cache.get(note.id) is not None
+
+    response = await user_client.delete(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_get_one_note_cached_checks_access(
+    client: AsyncClient, user_client: AsyncClient, db_session: AsyncSession
+) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_200_OK
+
+    token, _ = await user_auth(client, db_session)
+    response = await client.get(f"/api/notes/{note.id}/", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+
+
+async def test_bulk_update_notes_invalidates_cache(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await user_client.patch(
+        "/api/notes/bulk/", json={"items": [{"id": note.id, "title": "some", "body": "once told me"}]}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.json()["body"] == "once told me"
+
+
 async def test_get_one_note_forbidden(user_client: AsyncClient, db_session: AsyncSession) -> None:
     second_user = await get_user(db_session)
     factories.NoteFactory.__async_session__ = db_session
@@ -246,6 +478,17 @@ async def test_delete_note_does_not_exist(user_client: AsyncClient) -> None:
     assert response.status_code == status.HTTP_404_NOT_FOUND
 
 
+async def test_delete_note_already_deleted(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id, is_deleted=True)
+
+    response = await user_client.delete(
+        f"/api/notes/{note.id}/",
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert response.json()["detail"] == NotesErrorMessages.note_not_found
+
+
 @pytest.mark.parametrize("is_admin", [False, True])
 async def test_delete_note_forbidden(client: AsyncClient, db_session: AsyncSession, is_admin: bool) -> None:
     token, _ = await user_auth(client, db_session, is_admin)
@@ -300,6 +543,113 @@ async def test_get_all_user_by_admin(admin_client: AsyncClient, db_session: Asyn
         assert v == getattr(second_note, k)
 
 
+async def test_get_all_notes_by_admin_cursor_pagination(admin_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+
+    factories.NoteFactory.__async_session__ = db_session
+    first_note = await factories.NoteFactory.create_async(author_id=second_user.id)
+    second_note = await factories.NoteFactory.create_async(author_id=second_user.id, is_deleted=True)
+
+    response = await admin_client.get("/api/notes/", params={"paginationType": "cursor", "author_id": second_user.id})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert data["next_cursor"] is None
+    assert sorted(item["id"] for item in data["items"]) == sorted([first_note.id, second_note.id])
+    assert all("is_deleted" in item for item in data["items"])
+
+
+async def test_get_all_notes_summary_by_admin(admin_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=admin_client.user.id, is_deleted=True)
+
+    response = await admin_client.get("/api/notes/", params={"fields": "summary"})
+    assert response.status_code == status.HTTP_200_OK
+    [item] = response.json()["items"]
+    assert "body" not in item
+    assert item["id"] == note.id
+    assert item["is_deleted"] is True
+
+
+@pytest.mark.parametrize("count", ["exact", "estimate", "none"])
+async def test_get_all_notes_by_admin_count(admin_client: AsyncClient, db_session: AsyncSession, count: str) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    notes = await factories.NoteFactory.create_batch_async(3, author_id=admin_client.user.id)
+
+    response = await admin_client.get("/api/notes/", params={"count": count, "pageSize": 2, "currentPage": 2})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [notes[2].id]
+    assert (data["limit"], data["offset"]) == (2, 2)
+    match count:
+        case "exact":
+            assert data["total"] == len(notes)
+        case "estimate":
+            # planner statistics are not refreshed inside the test transaction, so only the type is certain
+            assert isinstance(data["total"], int)
+        case "none":
+            assert data["total"] is None
+
+
+@pytest.mark.parametrize("count", ["estimate", "none"])
+async def test_get_notes_without_count(user_client: AsyncClient, db_session: AsyncSession, count: str) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.get("/api/notes/my/", params={"count": count})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [note.id]
+    assert (data["total"] is None) is (count == "none")
+    assert "ETag" in response.headers
+    # neither the page nor its ETag count the notes of the user
+    assert not [statement for statement, _ in statements if "count(" in statement]
+
+
+@pytest.mark.parametrize("url", ["/api/notes/my/", "/api/notes/"])
+@pytest.mark.parametrize(
+    ("page_size", "status_code"),
+    [
+        (NotesConstraints.max_page_size, status.HTTP_200_OK),
+        (NotesConstraints.max_page_size + 1, status.HTTP_422_UNPROCESSABLE_CONTENT),
+        (0, status.HTTP_422_UNPROCESSABLE_CONTENT),
+    ],
+)
+async def test_list_notes_page_size(admin_client: AsyncClient, url: str, page_size: int, status_code: int) -> None:
+    response = await admin_client.get(url, params={"pageSize": page_size})
+    assert response.status_code == status_code
+
+
+@pytest.mark.parametrize("params", [{"count": "approximate"}, {"pageSize": NotesConstraints.max_page_size + 1}])
+async def test_get_notes_invalid_params(user_client: AsyncClient, params: dict[str, typing.Any]) -> None:
+    response = await user_client.get("/api/notes/my/", params=params)
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+async def test_search_notes_by_admin(admin_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+    third_user = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=second_user.id, title="apple", is_deleted=True)
+    other_note = await factories.NoteFactory.create_async(author_id=third_user.id, title="apple")
+
+    response = await admin_client.get("/api/notes/search/", params={"q": "apple", "author_id": second_user.id})
+    assert response.status_code == status.HTTP_200_OK
+    data = response.json()
+    assert [item["id"] for item in data["items"]] == [note.id]
+    assert data["items"][0]["is_deleted"] is True
+
+    response = await admin_client.get("/api/notes/search/", params={"q": "apple"})
+    assert response.status_code == status.HTTP_200_OK
+    assert sorted(item["id"] for item in response.json()["items"]) == sorted([note.id, other_note.id])
+
+
+async def test_search_notes_forbidden(user_client: AsyncClient) -> None:
+    response = await user_client.get("/api/notes/search/", params={"q": "apple"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json()["detail"] == NotesErrorMessages.access_denied_only_admin
+
+
 async def test_get_all_notes_forbidden(user_client: AsyncClient) -> None:
     response = await user_client.get(
         "/api/notes/",
@@ -352,3 +702,458 @@ async def test_restore_note_forbidden(user_client: AsyncClient, db_session: Asyn
     assert response.status_code == status.HTTP_403_FORBIDDEN
     data = response.json()
     assert data["detail"] == NotesErrorMessages.access_denied_only_admin
+
+
+async def test_bulk_create_notes(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    items = [{"title": f"title {i}", "body": f"body {i}"} for i in range(3)]
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.post("/api/notes/bulk/", json={"items": items})
+    assert response.status_code == status.HTTP_201_CREATED
+    assert len([statement for statement, _ in statements if statement.startswith("INSERT INTO notes")]) == 1
+
+    results = response.json()["items"]
+    assert [result["status"] for result in results] == [status.HTTP_201_CREATED] * len(items)
+    assert [result["note"]["title"] for result in results] == [item["title"] for item in items]
+    assert {result["note"]["author_id"] for result in results} == {user_client.user.id}
+
+    response = await user_client.get(f"/api/notes/{results[0]['id']}/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["body"] == items[0]["body"]
+
+
+@pytest.mark.parametrize(
+    "items",
+    [
+        [],
+        [{"title": "title", "body": "body"}] * (NotesConstraints.max_bulk_items + 1),
+        [{"title": "title", "body": "body"}, {"title": "title", "body": None}],
+    ],
+)
+async def test_bulk_create_notes_invalid(user_client: AsyncClient, items: list[dict[str, str | None]]) -> None:
+    response = await user_client.post("/api/notes/bulk/", json={"items": items})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+async def test_bulk_update_notes(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    first, second = await factories.NoteFactory.create_batch_async(2, author_id=user_client.user.id)
+    deleted = await factories.NoteFactory.create_async(author_id=user_client.user.id, is_deleted=True)
+    foreign = await factories.NoteFactory.create_async(author_id=second_user.id)
+    item_ids = [second.id, foreign.id, first.id, deleted.id, 999]
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.patch(
+            "/api/notes/bulk/",
+            json={"items": [{"id": item_id, "title": f"title {item_id}", "body": "updated"} for item_id in item_ids]},
+        )
+    assert response.status_code == status.HTTP_200_OK
+    assert len([statement for statement, _ in statements if statement.startswith("UPDATE notes")]) == 1
+
+    results = response.json()["items"]
+    assert [result["id"] for result in results] == item_ids
+    assert [result["status"] for result in results] == [
+        status.HTTP_200_OK,
+        status.HTTP_403_FORBIDDEN,
+        status.HTTP_200_OK,
+        status.HTTP_404_NOT_FOUND,
+        status.HTTP_404_NOT_FOUND,
+    ]
+    assert results[0]["note"]["title"] == f"title {second.id}"
+    assert results[1]["detail"] == NotesErrorMessages.access_denied_only_owner
+    assert results[3]["detail"] == NotesErrorMessages.note_not_found
+
+    response = await user_client.get(f"/api/notes/{first.id}/")
+    assert response.json()["title"] == f"title {first.id}"
+    assert await db_session.scalar(sa.select(models.Note.body).where(models.Note.id == foreign.id)) != "updated"
+
+
+async def test_bulk_update_notes_duplicate_ids(user_client: AsyncClient) -> None:
+    response = await user_client.patch(
+        "/api/notes/bulk/",
+        json={"items": [{"id": 1, "title": "title", "body": "body"}, {"id": 1, "title": "title", "body": "body"}]},
+    )
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+async def test_bulk_delete_notes(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+    foreign = await factories.NoteFactory.create_async(author_id=second_user.id)
+
+    response = await user_client.request("DELETE", "/api/notes/bulk/", json={"ids": [note.id, foreign.id, 999]})
+    assert response.status_code == status.HTTP_200_OK
+    assert [(result["id"], result["status"], result["note"]) for result in response.json()["items"]] == [
+        (note.id, status.HTTP_204_NO_CONTENT, None),
+        (foreign.id, status.HTTP_403_FORBIDDEN, None),
+        (999, status.HTTP_404_NOT_FOUND, None),
+    ]
+
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+    assert not await db_session.scalar(sa.select(models.Note.is_deleted).where(models.Note.id == foreign.id))
+
+
+async def test_bulk_delete_notes_skips_probe_on_success(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    notes = await factories.NoteFactory.create_batch_async(2, author_id=user_client.user.id)
+
+    with capture_statements(db_session) as statements:
+        response = await user_client.request("DELETE", "/api/notes/bulk/", json={"ids": [note.id for note in notes]})
+    assert response.status_code == status.HTTP_200_OK
+    assert {result["status"] for result in response.json()["items"]} == {status.HTTP_204_NO_CONTENT}
+    assert not [statement for statement, _ in statements if "FROM notes" in statement]
+
+
+@pytest.mark.parametrize("ids", [[], [1, 1]])
+async def test_bulk_delete_notes_invalid(user_client: AsyncClient, ids: list[int]) -> None:
+    response = await user_client.request("DELETE", "/api/notes/bulk/", json={"ids": ids})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+async def test_get_note_not_modified(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+
+    response = await user_client.get(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    for if_none_match in [etag, f"W/{etag}", f'"other", {etag}', "*"]:
+        with capture_statements(db_session) as statements:
+            response = await user_client.get(f"/api/notes/{note.id}/", headers={"If-None-Match": if_none_match})
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.headers["ETag"] == etag
+        assert not response.content
+        assert not [statement for statement, _ in statements if "notes.body" in statement]
+
+    response = await user_client.put(f"/api/notes/{note.id}/", json={"title": "some", "body": "once told me"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+    response = await user_client.get(f"/api/notes/{note.id}/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["title"] == "some"
+    assert response.headers["ETag"] != etag
+
+
+async def test_get_note_not_modified_checks_access(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=second_user.id)
+
+    response = await user_client.get(f"/api/notes/{note.id}/", headers={"If-None-Match": "*"})
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = await user_client.get("/api/notes/999/", headers={"If-None-Match": "*"})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.parametrize(
+    ("if_match", "status_code"),
+    [
+        (None, status.HTTP_200_OK),
+        ("*", status.HTTP_200_OK),
+        ("current", status.HTTP_200_OK),
+        ('"1.0", current', status.HTTP_200_OK),
+        ("weak", status.HTTP_412_PRECONDITION_FAILED),
+        ('"garbage"', status.HTTP_412_PRECONDITION_FAILED),
+        ('"1.99999999999999999999"', status.HTTP_412_PRECONDITION_FAILED),
+        ("stale", status.HTTP_412_PRECONDITION_FAILED),
+    ],
+)
+async def test_put_notes_if_match(
+    user_client: AsyncClient, db_session: AsyncSession, if_match: str | None, status_code: int
+) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+    etag = (await user_client.get(f"/api/notes/{note.id}/")).headers["ETag"]
+    if if_match == "stale":
+        response = await user_client.put(f"/api/notes/{note.id}/", json={"title": "first", "body": "writer"})
+        assert response.status_code == status.HTTP_200_OK
+    headers = {}
+    if if_match is not None:
+        headers["If-Match"] = if_match.replace("stale", "current").replace("weak", "W/current").replace("current", etag)
+
+    response = await user_client.put(
+        f"/api/notes/{note.id}/", json={"title": "second", "body": "writer"}, headers=headers
+    )
+    assert response.status_code == status_code
+    if status_code == status.HTTP_412_PRECONDITION_FAILED:
+        assert response.json()["detail"] == NotesErrorMessages.precondition_failed
+    else:
+        assert response.headers["ETag"] != etag
+
+
+async def test_put_notes_if_match_checks_access(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    second_user = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=second_user.id)
+
+    response = await user_client.put(
+        f"/api/notes/{note.id}/", json={"title": "some", "body": "once told me"}, headers={"If-Match": '"1.0"'}
+    )
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    response = await user_client.put(
+        "/api/notes/999/", json={"title": "some", "body": "once told me"}, headers={"If-Match": '"999.0"'}
+    )
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+async def test_get_notes_not_modified(user_client: AsyncClient, db_session: AsyncSession) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    note = await factories.NoteFactory.create_async(author_id=user_client.user.id)
+
+    response = await user_client.get("/api/notes/my/", params={"paginationType": "cursor"})
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+
+    # a weak validator, since compressed and identity responses of the page share it
+    assert etag.startswith('W/"')
+
+    # the page is validated from an index before any note is read, and without counting them
+    with capture_statements(db_session) as statements:
+        response = await user_client.get(
+            "/api/notes/my/", params={"paginationType": "cursor"}, headers={"If-None-Match": etag}
+        )
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.headers["ETag"] == etag
+    [validator] = [statement for statement, _ in statements if "FROM notes" in statement]
+    assert "max(notes.updated_at)" in validator
+    assert "count(" not in validator
+
+    response = await user_client.put(f"/api/notes/{note.id}/", json={"title": "some", "body": "once told me"})
+    assert response.status_code == status.HTTP_200_OK
+    response = await user_client.get(
+        "/api/notes/my/", params={"paginationType": "cursor"}, headers={"If-None-Match": etag}
+    )
+    assert response.status_code == status.HTTP_200_OK
+
+    response = await user_client.get("/api/notes/my/")
+    assert response.status_code == status.HTTP_200_OK
+    etag = response.headers["ETag"]
+    response = await user_client.get("/api/notes/my/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    response = await user_client.get("/api/notes/my/", params={"fields": "summary"}, headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["ETag"] != etag
+
+    response = await user_client.post("/api/notes/", json={"title": "another", "body": "note"})
+    assert response.status_code == status.HTTP_201_CREATED
+    response = await user_client.get("/api/notes/my/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["items"]) == 2  # noqa: PLR2004
+    assert response.headers["ETag"] != etag
+
+    etag = response.headers["ETag"]
+    response = await user_client.delete(f"/api/notes/{note.id}/")
+    assert response.status_code == status.HTTP_204_NO_CONTENT
+    response = await user_client.get("/api/notes/my/", headers={"If-None-Match": etag})
+    assert response.status_code == status.HTTP_200_OK
+    assert len(response.json()["items"]) == 1
+
+
+async def test_export_notes_by_admin(
+    admin_client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "notes_export_chunk_size", 2)
+    author = await get_user(db_session)
+    other_author = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    notes = [await factories.NoteFactory.create_async(author_id=author.id) for _ in range(3)]
+    deleted_note = await factories.NoteFactory.create_async(author_id=author.id, is_deleted=True)
+    other_note = await factories.NoteFactory.create_async(author_id=other_author.id)
+
+    response = await admin_client.get("/api/notes/export/", params={"author_id": author.id})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers["Content-Type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["id"] for line in lines] == [note.id for note in notes]
+    for line, note in zip(lines, notes, strict=True):
+        assert line == schemas.NoteAdmin.model_validate(note).model_dump() | {
+            "created_at": note.created_at.isoformat().replace("+00:00", "Z"),
+            "updated_at": note.updated_at.isoformat().replace("+00:00", "Z"),
+        }
+
+    response = await admin_client.get("/api/notes/export/", params={"author_id": author.id, "include_deleted": True})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [
+        *(note.id for note in notes),
+        deleted_note.id,
+    ]
+
+    response = await admin_client.get("/api/notes/export/")
+    exported_ids = {json.loads(line)["id"] for line in response.text.splitlines()}
+    assert {other_note.id, *(note.id for note in notes)} <= exported_ids
+    assert deleted_note.id not in exported_ids
+
+
+async def test_export_notes_updated_since(admin_client: AsyncClient, db_session: AsyncSession) -> None:
+    author = await get_user(db_session)
+    factories.NoteFactory.__async_session__ = db_session
+    since = dt.datetime(2025, 1, 1, tzinfo=dt.UTC)
+    await factories.NoteFactory.create_async(author_id=author.id, updated_at=since - dt.timedelta(seconds=1))
+    recent_note = await factories.NoteFactory.create_async(author_id=author.id, updated_at=since)
+
+    response = await admin_client.get(
+        "/api/notes/export/", params={"author_id": author.id, "updated_since": since.isoformat()}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [recent_note.id]
+
+    response = await admin_client.get("/api/notes/export/", params={"updated_since": "2025-01-01T00:00:00"})
+    assert response.status_code == status.HTTP_422_UNPROCESSABLE_CONTENT
+
+
+async def test_export_notes_forbidden(user_client: AsyncClient) -> None:
+    response = await user_client.get("/api/notes/export/")
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    assert response.json()["detail"] == NotesErrorMessages.access_denied_only_admin
+
+
+async def test_import_notes_ndjson(
+    user_client: AsyncClient, db_session: AsyncSession, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "notes_import_batch_size", 2)
+    lines = [
+        json.dumps({"title": "first", "body": "first body"}),
+        "",
+        "not json",
+        json.dumps({"title": "a" * 257, "body": "body"}),
+        json.dumps({"title": "second", "body": "second body"}),
+        json.dumps({"title": "third", "body": "third body"}),
+    ]
+
+    async def upload() -> typing.AsyncIterator[bytes]:
+        for line in lines:
+            yield line.encode() + b"\n"
+
+    response = await user_client.post(
+        "/api/notes/import/", content=upload(), headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["created"] == 3  # noqa: PLR2004
+    assert data["failed"] == 2  # noqa: PLR2004
+    assert [error["line"] for error in data["errors"]] == [3, 4]
+    assert data["errors"][0]["detail"].startswith("Invalid JSON")
+    assert data["errors"][1]["detail"].startswith("title: ")
+
+    titles = await db_session.scalars(
+        sa.select(models.Note.title).where(models.Note.author_id == user_client.user.id).order_by(models.Note.id)
+    )
+    assert titles.all() == ["first", "second", "third"]
+
+
+async def test_import_notes_csv(user_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, "notes_import_max_reported_errors", 1)
+    content = (
+        'body,title\r\nplain body,first\r\n"multi\r\nline, ""quoted"" body",second\r\nmissing body\r\n'
+        f'{"a" * 65537},too long\r\n"unterminated,third\r\n'
+    )
+    response = await user_client.post(
+        "/api/notes/import/", content=content.encode(), headers={"Content-Type": "text/csv; charset=utf-8"}
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    data = response.json()
+    assert data["created"] == 2  # noqa: PLR2004
+    assert data["failed"] == 3  # noqa: PLR2004
+    assert data["errors"] == [{"line": 5, "detail": "title: Field required"}]
+
+    response = await user_client.get("/api/notes/my/")
+    assert [(item["title"], item["body"]) for item in response.json()["items"]] == [
+        ("first", "plain body"),
+        ("second", 'multi\nline, "quoted" body'),
+    ]
+
+
+async def test_import_notes_invalid(user_client: AsyncClient) -> None:
+    response = await user_client.post(
+        "/api/notes/import/", content=b"title,text\n", headers={"Content-Type": "text/csv"}
+    )
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.json()["detail"] == NotesErrorMessages.invalid_import_header
+
+    response = await user_client.post("/api/notes/import/", content=b"{}", headers={"Content-Type": "application/json"})
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+    assert response.json()["detail"] == NotesErrorMessages.unsupported_import_type
+
+    response = await user_client.post(
+        "/api/notes/import/",
+        content=b"{}",
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+    )
+    assert response.status_code == status.HTTP_415_UNSUPPORTED_MEDIA_TYPE
+
+
+NOTE_PAYLOAD: typing.Final = {"title": "normal note title", "body": "normal note body"}
+
+
+# the test transaction wraps every request in a savepoint; writes release it where they would commit
+TEST_TRANSACTION_OVERHEAD: typing.Final = 1
+
+
+async def check_num_queries(
+    client: AsyncClient,
+    db_session: AsyncSession,
+    endpoint: str,
+    payload: dict[str, typing.Any] | None,
+    expected: int,
+) -> None:
+    factories.NoteFactory.__async_session__ = db_session
+    # enough notes for a query per note to stand out
+    notes = await factories.NoteFactory.create_batch_async(20, author_id=client.user.id)
+    # the user lookup happens once, before the principal gets cached
+    response = await client.get("/api/notes/my/?count=none")
+    assert response.is_success
+
+    method, url = endpoint.split()
+    with assert_num_queries(expected, overhead=TEST_TRANSACTION_OVERHEAD):
+        response = await client.request(method, url.format(note_id=notes[0].id), json=payload)
+    assert response.is_success
+
+
+@pytest.mark.parametrize(
+    ("endpoint", "payload", "expected"),
+    [
+        # the latest change among the notes of the user, for the ETag, and the page
+        ("GET /api/notes/my/", None, 2),
+        ("GET /api/notes/my/?paginationType=cursor", None, 2),
+        ("GET /api/notes/my/?count=none", None, 2),
+        ("GET /api/notes/my/search/?q=note", None, 1),
+        ("GET /api/notes/{note_id}/", None, 1),
+        ("POST /api/notes/", NOTE_PAYLOAD, 4),
+        ("PUT /api/notes/{note_id}/", NOTE_PAYLOAD, 3),
+        ("DELETE /api/notes/{note_id}/", None, 3),
+        ("POST /api/notes/bulk/", {"items": [NOTE_PAYLOAD] * 20}, 3),
+    ],
+)
+async def test_notes_num_queries(
+    user_client: AsyncClient,
+    db_session: AsyncSession,
+    endpoint: str,
+    payload: dict[str, typing.Any] | None,
+    expected: int,
+) -> None:
+    await check_num_queries(user_client, db_session, endpoint, payload, expected)
+
+
+@pytest.mark.parametrize(
+    ("endpoint", "payload", "expected"),
+    [
+        ("GET /api/notes/", None, 1),
+        ("GET /api/notes/?count=estimate", None, 2),
+        ("GET /api/notes/?count=none", None, 1),
+        ("GET /api/notes/search/?q=note", None, 1),
+        ("GET /api/notes/{note_id}/", None, 1),
+    ],
+)
+async def test_admin_notes_num_queries(
+    admin_client: AsyncClient,
+    db_session: AsyncSession,
+    endpoint: str,
+    payload: dict[str, typing.Any] | None,
+    expected: int,
+) -> None:
+    await check_num_queries(admin_client, db_session, endpoint, payload, expected)
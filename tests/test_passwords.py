@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+from advanced_alchemy.types.password_hash.base import HashedPassword
+from advanced_alchemy.types.password_hash.passlib import PasslibHasher
+
+from app.exceptions import PasswordHasherBusyError
+from app.models.users import pwd_context
+from app.passwords import PasswordHasher
+
+
+async def test_password_hasher_queue_depth() -> None:
+    hasher = PasswordHasher(max_workers=1, max_queue=2)
+    hashed = HashedPassword(await hasher.hash("password"), PasslibHasher(pwd_context))
+
+    tasks = [asyncio.create_task(hasher.verify(hashed, password)) for password in ("password", "wrong", "password")]
+    await asyncio.sleep(0)
+    assert hasher.queue_depth == len(tasks) - 1
+
+    assert await asyncio.gather(*tasks) == [True, False, True]
+    assert hasher.in_flight == 0
+    assert hasher.queue_depth == 0
+    hasher.shutdown()
+
+
+async def test_password_hasher_rejects_beyond_max_queue() -> None:
+    hasher = PasswordHasher(max_workers=1, max_queue=1)
+    tasks = [asyncio.create_task(hasher.hash("password")) for _ in range(2)]
+    await asyncio.sleep(0)
+
+    with pytest.raises(PasswordHasherBusyError):
+        await hasher.hash("password")
+    assert hasher.in_flight == len(tasks)
+
+    await asyncio.gather(*tasks)
+    assert await hasher.hash("password")
+    hasher.shutdown()
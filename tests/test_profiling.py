@@ -0,0 +1,131 @@
+import asyncio
+import pathlib
+import typing
+from unittest import mock
+
+import fastapi
+import modern_di
+import pytest
+from asgi_lifespan import LifespanManager
+from fastapi import status
+from httpx import AsyncClient
+from pyinstrument import Profiler
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import ioc, profiling
+from app.api import notes as notes_api
+from app.application import build_app
+from app.profiling import PROFILE_FILE_HEADER, PROFILED_STATUS_HEADER
+from app.repositories import UsersService
+from app.settings import settings
+
+
+SPEEDSCOPE_SCHEMA: typing.Final = "https://www.speedscope.app/file-format-schema.json"
+
+
+@pytest.fixture
+def profiling_output_dir(request: pytest.FixtureRequest, tmp_path: pathlib.Path) -> str:
+    # profiles are returned in place of responses unless a test asks for them to be written
+    return str(tmp_path / request.param) if hasattr(request, "param") else ""
+
+
+@pytest.fixture
+async def app(monkeypatch: pytest.MonkeyPatch, profiling_output_dir: str) -> typing.AsyncIterator[fastapi.FastAPI]:
+    monkeypatch.setattr(settings, "profiling_enabled", True)
+    monkeypatch.setattr(settings, "profiling_output_dir", profiling_output_dir)
+    monkeypatch.setattr(settings, "profiling_interval", 0.0001)
+    app_ = build_app()
+    async with LifespanManager(app_):
+        yield app_
+
+
+async def test_profile_is_returned_to_admin(admin_client: AsyncClient, monkeypatch: pytest.MonkeyPatch) -> None:
+    list_page = notes_api.list_page
+
+    async def slow_list_page(*args: typing.Any, **kwargs: typing.Any) -> typing.Any:  # noqa: ANN401
+        await asyncio.sleep(0.01)
+        return await list_page(*args, **kwargs)
+
+    # the handler awaits long enough for sampling not to miss it, which async mode attributes to the handler
+    monkeypatch.setattr(notes_api, "list_page", slow_list_page)
+    response = await admin_client.get("/api/notes/", headers={"X-Profile": "1"})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.headers[PROFILED_STATUS_HEADER] == str(status.HTTP_200_OK)
+    assert response.headers["Content-Disposition"].endswith('.speedscope.json"')
+    profile = response.json()
+    assert profile["$schema"] == SPEEDSCOPE_SCHEMA
+    assert any(frame["name"] == "list_notes" for frame in profile["shared"]["frames"])
+
+
+async def test_profile_of_login_with_admin_token(admin_client: AsyncClient) -> None:
+    response = await admin_client.post(
+        "/api/users/token/?profile=true", data={"username": admin_client.user.login, "password": "password"}
+    )
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json()["$schema"] == SPEEDSCOPE_SCHEMA
+
+
+@pytest.mark.parametrize("flag", [{"headers": {"X-Profile": "1"}}, {"params": {"profile": "1"}}])
+async def test_profile_is_not_returned_to_others(
+    user_client: AsyncClient, client: AsyncClient, monkeypatch: pytest.MonkeyPatch, flag: dict[str, typing.Any]
+) -> None:
+    profiler = mock.Mock(wraps=Profiler)
+    monkeypatch.setattr(profiling, "Profiler", profiler)
+
+    response = await user_client.get("/api/notes/my/", **flag)
+    assert response.status_code == status.HTTP_200_OK
+    assert "items" in response.json()
+
+    response = await client.get("/api/notes/my/", **flag)
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+
+    response = await client.get(
+        "/api/notes/my/", headers={"Authorization": "Bearer invalid", **flag.get("headers", {})}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    # their requests are not even sampled
+    profiler.assert_not_called()
+
+
+@pytest.mark.parametrize("trust_claims", [False, True])
+async def test_profile_is_not_returned_to_former_admin(
+    admin_client: AsyncClient,
+    db_session: AsyncSession,
+    di_container: modern_di.Container,
+    monkeypatch: pytest.MonkeyPatch,
+    trust_claims: bool,
+) -> None:
+    monkeypatch.setattr(settings, "jwt_trust_claims", trust_claims)
+    users_service = UsersService(
+        session=db_session,
+        principals_cache=await ioc.Dependencies.principals_cache.async_resolve(di_container),
+        token_revocations=await ioc.Dependencies.token_revocations.async_resolve(di_container),
+    )
+    await users_service.update({"is_admin": False}, item_id=admin_client.user.id)
+    response = await admin_client.get("/api/notes/my/", headers={"X-Profile": "1"})
+    assert response.status_code == status.HTTP_200_OK
+    assert PROFILED_STATUS_HEADER not in response.headers
+
+    await users_service.update({"is_admin": True}, item_id=admin_client.user.id)
+    await users_service.delete(admin_client.user.id)
+    # logging in does not authenticate anyone, so the token alone must not let the request be profiled
+    response = await admin_client.post(
+        "/api/users/token/?profile=1", data={"username": admin_client.user.login, "password": "password"}
+    )
+    assert response.status_code == status.HTTP_401_UNAUTHORIZED
+    assert PROFILED_STATUS_HEADER not in response.headers
+
+
+async def test_profile_is_not_requested(admin_client: AsyncClient) -> None:
+    response = await admin_client.get("/api/notes/", headers={"X-Profile": "0"}, params={"profile": "1"})
+    assert response.status_code == status.HTTP_200_OK
+    assert PROFILED_STATUS_HEADER not in response.headers
+
+
+@pytest.mark.parametrize("profiling_output_dir", ["profiles"], indirect=True)
+async def test_profile_is_written_to_output_dir(admin_client: AsyncClient, profiling_output_dir: str) -> None:
+    response = await admin_client.get("/api/notes/", headers={"X-Profile": "1"})
+    assert response.status_code == status.HTTP_200_OK
+    assert "items" in response.json()
+    profile = pathlib.Path(profiling_output_dir) / response.headers[PROFILE_FILE_HEADER]
+    assert SPEEDSCOPE_SCHEMA in profile.read_text()
@@ -0,0 +1,49 @@
+import typing
+
+import fastapi
+import pytest
+import sqlalchemy as sa
+from asgi_lifespan import LifespanManager
+from fastapi import status
+from httpx import AsyncClient
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.application import build_app
+from app.query_stats import collect_queries
+from app.settings import settings
+
+
+@pytest.fixture
+async def app(monkeypatch: pytest.MonkeyPatch) -> typing.AsyncIterator[fastapi.FastAPI]:
+    monkeypatch.setattr(settings, "service_debug", True)
+    app_ = build_app()
+    async with LifespanManager(app_):
+        yield app_
+
+
+async def test_server_timing(user_client: AsyncClient) -> None:
+    response = await user_client.get("/api/notes/my/")
+    assert response.status_code == status.HTTP_200_OK
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=")
+    # the test transaction's savepoint, the user lookup, the latest change for the ETag and the page with its total
+    assert timing.endswith('desc="4 queries"')
+
+    response = await user_client.get("/metrics")
+    assert 'http_request_db_queries_count{handler="/api/notes/my/"}' in response.text
+    assert 'http_request_db_seconds_count{handler="/api/notes/my/"}' in response.text
+
+
+async def test_collect_queries_nested(db_session: AsyncSession) -> None:
+    # begins the session's savepoint, so that only the statements below are counted
+    await db_session.execute(sa.text("SELECT 0"))
+    with collect_queries() as outer:
+        await db_session.execute(sa.text("SELECT 1"))
+        with collect_queries() as inner:
+            await db_session.execute(sa.text("SELECT 2"))
+            with pytest.raises(sa.exc.DBAPIError):
+                await db_session.execute(sa.text("SELECT 1 / 0"))
+
+    assert inner.count == 2  # noqa: PLR2004
+    assert outer.count == 3  # noqa: PLR2004
+    assert outer.duration >= inner.duration > 0
@@ -0,0 +1,29 @@
+import datetime as dt
+import json
+
+from advanced_alchemy.service import OffsetPagination
+
+from app import schemas
+from app.responses import ORJSONResponse
+
+
+def test_orjson_response_renders_schemas() -> None:
+    note = schemas.NoteSummary(
+        id=1,
+        title="title",
+        author_id=2,
+        created_at=dt.datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt.UTC),
+        updated_at=dt.datetime(2025, 1, 2, 3, 4, 5, tzinfo=dt.UTC),
+    )
+    page = OffsetPagination[schemas.NoteSummary](items=[note], limit=10, offset=0, total=1)
+
+    response = ORJSONResponse(page, headers={"ETag": '"etag"'})
+
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["etag"] == '"etag"'
+    assert json.loads(response.body) == {
+        "items": [json.loads(note.model_dump_json())],
+        "limit": 10,
+        "offset": 0,
+        "total": 1,
+    }
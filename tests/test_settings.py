@@ -0,0 +1,32 @@
+import pydantic
+import pytest
+
+from app.settings import Settings
+
+
+@pytest.mark.parametrize(
+    ("max_connections", "pool_size", "max_overflow"),
+    [
+        (0, 5, 10),
+        (200, 5, 10),
+        (100, 5, 7),
+        (32, 4, 0),
+        (56, 5, 2),
+    ],
+)
+def test_db_pool_fits_connections_budget(max_connections: int, pool_size: int, max_overflow: int) -> None:
+    settings = Settings(app_workers=8, db_pool_size=5, db_max_overflow=10, db_max_connections=max_connections)
+    assert (settings.db_worker_pool_size, settings.db_worker_max_overflow) == (pool_size, max_overflow)
+
+
+def test_db_connections_budget_too_small() -> None:
+    with pytest.raises(pydantic.ValidationError, match="db_max_connections"):
+        Settings(app_workers=8, db_max_connections=15)
+
+
+@pytest.mark.parametrize("app_workers", [None, 4, 25])
+def test_db_connections_stay_within_default_budget(app_workers: int | None) -> None:
+    settings = Settings() if app_workers is None else Settings(app_workers=app_workers)
+    # the change listener of every worker checks its connection out of the worker's pool
+    connections = settings.app_workers * (settings.db_worker_pool_size + settings.db_worker_max_overflow)
+    assert connections <= settings.db_max_connections
@@ -0,0 +1,151 @@
+import time
+import typing
+
+import asyncpg
+import pytest
+from opentelemetry import trace
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+from opentelemetry.sdk.trace.sampling import Decision
+from opentelemetry.semconv.attributes.http_attributes import HTTP_ROUTE
+from opentelemetry.trace import StatusCode
+
+from app.settings import settings
+from app.tracing import (
+    PARAMETERS_ATTRIBUTE,
+    REDACTED,
+    BoundedAsyncPGInstrumentor,
+    RouteRatioSampler,
+    TailSamplingSpanProcessor,
+    TraceSampling,
+)
+
+
+LOW_TRACE_ID: typing.Final = 1
+HIGH_TRACE_ID: typing.Final = (1 << 64) - 1
+
+
+def test_route_ratio_sampler() -> None:
+    sampler = RouteRatioSampler(head_ratio=0.5, tail_ratio=0.25, route_ratios={"/api/notes/bulk/": 0})
+
+    assert sampler.should_sample(None, LOW_TRACE_ID, "GET").decision is Decision.RECORD_AND_SAMPLE
+    assert sampler.should_sample(None, 10 << 60, "GET").decision is Decision.RECORD_ONLY
+    assert sampler.should_sample(None, HIGH_TRACE_ID, "GET").decision is Decision.DROP
+    bulk = {HTTP_ROUTE: "/api/notes/bulk/"}
+    assert sampler.should_sample(None, LOW_TRACE_ID, "POST", attributes=bulk).decision is Decision.RECORD_ONLY
+    assert "RouteRatioSampler" in sampler.get_description()
+
+
+@pytest.mark.parametrize(
+    ("trace_id", "decision"),
+    [(LOW_TRACE_ID, Decision.RECORD_AND_SAMPLE), (10 << 60, Decision.RECORD_ONLY), (HIGH_TRACE_ID, Decision.DROP)],
+)
+def test_route_ratio_sampler_follows_root(trace_id: int, decision: Decision) -> None:
+    provider = TracerProvider(sampler=RouteRatioSampler(head_ratio=0.5, tail_ratio=0.25, route_ratios={}))
+    tracer = provider.get_tracer(__name__)
+    provider.id_generator.generate_trace_id = lambda: trace_id  # type: ignore[method-assign]
+
+    with tracer.start_as_current_span("root") as root, tracer.start_as_current_span("child") as child:
+        assert root.is_recording() is child.is_recording() is (decision is not Decision.DROP)
+        assert child.get_span_context().trace_flags.sampled is (decision is Decision.RECORD_AND_SAMPLE)
+
+
+def test_tail_sampling_processor() -> None:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=RouteRatioSampler(head_ratio=0, tail_ratio=1, route_ratios={}))
+    provider.add_span_processor(TailSamplingSpanProcessor(exporter, latency_threshold=0.05, max_pending_traces=2))
+    tracer = provider.get_tracer(__name__)
+
+    with tracer.start_as_current_span("fast"), tracer.start_as_current_span("query"):
+        pass
+    with tracer.start_as_current_span("slow"), tracer.start_as_current_span("query"):
+        time.sleep(0.05)
+    with tracer.start_as_current_span("failed"), tracer.start_as_current_span("query") as query:
+        query.set_status(StatusCode.ERROR)
+    # spans of traces beyond the limit are dropped, so the last trace loses its failed span
+    roots = [tracer.start_span(f"concurrent #{index}") for index in range(3)]
+    for root in roots:
+        child = tracer.start_span("query", context=trace.set_span_in_context(root))
+        child.set_status(StatusCode.ERROR)
+        child.end()
+    for root in roots:
+        root.end()
+    provider.force_flush()
+
+    exported = exporter.get_finished_spans()
+    assert [span.name for span in exported] == [
+        *("query", "slow"),
+        *("query", "failed"),
+        *("query", "concurrent #0"),
+        *("query", "concurrent #1"),
+    ]
+    assert all(span.context.trace_flags.sampled for span in exported)
+    provider.shutdown()
+
+
+def test_tail_sampling_processor_skips_sampled_spans() -> None:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider(sampler=RouteRatioSampler(head_ratio=1, tail_ratio=0, route_ratios={}))
+    provider.add_span_processor(TailSamplingSpanProcessor(exporter, latency_threshold=0, max_pending_traces=1))
+    with provider.get_tracer(__name__).start_as_current_span("root"):
+        pass
+    provider.force_flush()
+
+    assert exporter.get_finished_spans() == ()
+    provider.shutdown()
+
+
+def test_trace_sampling_installs_sampler() -> None:
+    provider = TracerProvider()
+    instrumentor = TraceSampling(
+        head_ratio=0.1,
+        tail_ratio=0.1,
+        route_ratios={},
+        tail_latency_threshold=1,
+        tail_max_pending_traces=1,
+        exporter_endpoint="localhost:4317",
+    )
+    instrumentor.instrument(tracer_provider=provider)
+    try:
+        assert provider.sampler is instrumentor.sampler
+        processors = provider._active_span_processor._span_processors  # noqa: SLF001
+        assert any(isinstance(processor, TailSamplingSpanProcessor) for processor in processors)
+    finally:
+        instrumentor.uninstrument()
+        provider.shutdown()
+
+
+def test_parameters_are_bounded_and_redacted() -> None:
+    instrumentor = BoundedAsyncPGInstrumentor(
+        capture_parameters=True, max_length=12, max_items=2, redacted_columns=["password"]
+    )
+    assert instrumentor.format_parameters("SELECT $1, $2, $3", ["x" * 100, 1, 2]) == "('xxx...xxxx', 1, ...)"
+    assert instrumentor.format_parameters("UPDATE users SET password = $1", ["hash"]) == REDACTED
+    assert instrumentor.format_parameters("SELECT $1", [[(1, 2)] * 10]) == "([(1, 2), (1, 2), ...],)"
+
+
+async def test_parameters_are_captured_on_recorded_spans() -> None:
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    instrumentor = BoundedAsyncPGInstrumentor(
+        capture_parameters=True, max_length=12, max_items=4, redacted_columns=["password"]
+    )
+    instrumentor.instrument(tracer_provider=provider)
+    connection = await asyncpg.connect(settings.db_dsn.replace("+asyncpg", ""))
+    try:
+        await connection.fetchval("SELECT $1::text", "x" * 100)
+        await connection.fetchval("SELECT $1::text AS password", "secret")
+        async with connection.transaction():
+            assert [row[0] async for row in connection.cursor("SELECT generate_series(1, $1)", 2)] == [1, 2]
+    finally:
+        await connection.close()
+        instrumentor.uninstrument()
+
+    parameters = [
+        span.attributes.get(PARAMETERS_ATTRIBUTE) for span in exporter.get_finished_spans() if span.attributes
+    ]
+    assert "('xxx...xxxx',)" in parameters
+    assert REDACTED in parameters
+    assert "(2,)" in parameters
@@ -1,8 +1,13 @@
+import contextlib
+import typing
+
 import fastapi
+import sqlalchemy as sa
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app import models
+from app.query_stats import QueryStats, collect_queries
 from tests import factories
 
 
@@ -21,3 +26,37 @@ async def user_auth(client: AsyncClient, db_session: AsyncSession, is_admin: boo
     user = await get_user(db_session, is_admin)
     token = await get_token(client, user)
     return token, user
+
+
+@contextlib.contextmanager
+def capture_statements(db_session: AsyncSession) -> typing.Iterator[list[tuple[str, typing.Any]]]:
+    """Collect SQL statements with their parameters executed on the shared test connection."""
+    statements: list[tuple[str, typing.Any]] = []
+    connection = typing.cast("sa.ext.asyncio.AsyncConnection", db_session.bind).sync_connection
+
+    def before_cursor_execute(*args: typing.Any) -> None:  # noqa: ANN401
+        _, _, statement, parameters, *_ = args
+        statements.append((statement, parameters))
+
+    sa.event.listen(connection, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        sa.event.remove(connection, "before_cursor_execute", before_cursor_execute)
+
+
+@contextlib.contextmanager
+def assert_num_queries(expected: int, overhead: int = 0) -> typing.Iterator[QueryStats]:
+    """Fail unless the block executes exactly ``expected`` SQL statements besides ``overhead`` ones.
+
+    Pinning the count catches a single added statement, not only N+1 regressions.
+    """
+    with collect_queries() as stats:
+        yield stats
+    assert stats.count - overhead == expected, f"{stats.count - overhead} statements executed, {expected} expected"
+
+
+async def explain(db_session: AsyncSession, statement: str, parameters: typing.Any) -> str:  # noqa: ANN401
+    connection = await db_session.connection()
+    result = await connection.exec_driver_sql(f"EXPLAIN {statement}", parameters)
+    return "\n".join(row[0] for row in result)